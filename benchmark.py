@@ -0,0 +1,438 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+# Nothing is drawn while benchmarking, so the game must not open a window when
+# it is imported below.
+os.environ.setdefault("SNAKE_HEADLESS", "1")
+
+import numpy as np
+import neat
+import trainAI
+from resources.util import make_decision, generate_food, has_failed
+from resources.network import BatchNetwork
+from gamesrc.config import GameConfig, DEFAULT_GAME
+from gamesrc.grid import Grid
+from gamesrc.snake import Snake
+from gamesrc.food import Food
+from gamesrc.batch import BatchGame
+from gamesrc.observation import observe, observe_batch
+from gamesrc.moves import STEPS, TURNS
+
+# Measures how fast the parts of the game and of training run. Every benchmark
+# uses fixed seeds, runs a fixed amount of work and keeps the best of a few
+# repeats. The results can be saved as JSON and compared against a saved
+# baseline to catch regressions.
+
+
+def hamiltonian_cycle(width=30, height=30):
+    """
+    This function builds a path that visits every position of the grid once
+    and returns to where it started. A snake of any length can follow it
+    forever without running into itself.
+
+    Arguments:
+        width {int} -- The width of the grid
+        height {int} -- The height of the grid, which must be even
+
+    Returns:
+        list -- The (x, y) positions of the cycle in order
+    """
+    if height % 2 == 1:
+        raise ValueError("The benchmarks need a board with an even height")
+
+    cycle = [(x, 0) for x in range(width)]
+    for y in range(1, height):
+        xs = range(width - 1, 0, -1) if y % 2 == 1 else range(1, width)
+        cycle.extend((x, y) for x in xs)
+    cycle.extend((0, y) for y in range(height - 1, 0, -1))
+    return cycle
+
+
+def make_snake(length, game_config=DEFAULT_GAME):
+    """
+    This function places a snake of the given length on the Hamiltonian cycle
+    and works out the actions that keep it on the cycle.
+
+    Arguments:
+        length {int} -- The length of the snake, less than the number of
+        positions on the board
+        game_config {GameConfig} -- The board to place it on
+
+    Returns:
+        tuple -- The grid, the snake and a list of actions to repeat, one for
+        every position on the board
+    """
+    cycle = hamiltonian_cycle(game_config.width, game_config.height)
+    head = length - 1
+
+    def orientation(a, b):
+        return STEPS.index((b[0] - a[0], b[1] - a[1]))
+
+    grid = Grid(game_config)
+    coords = [cycle[i] for i in range(head, -1, -1)]
+    snake = Snake(grid, coords, orientation(cycle[head - 1], cycle[head]))
+
+    actions = []
+    facing = snake.orientation
+    for i in range(head, head + len(cycle)):
+        wanted = orientation(cycle[i % len(cycle)],
+                             cycle[(i + 1) % len(cycle)])
+        action = [turns[facing] for turns in TURNS].index(wanted)
+        actions.append(action)
+        facing = wanted
+
+    return grid, snake, actions
+
+
+def load_config(pop_size):
+    """
+    This function loads the NN config used for training.
+
+    Arguments:
+        pop_size {int} -- The population size to use instead of the configured one
+
+    Returns:
+        Config -- The NEAT config
+    """
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    config_path = os.path.join(local_dir, "resources/config-feedforward.txt")
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_path)
+    config.pop_size = pop_size
+    return config
+
+
+def make_genomes(config, count, seed):
+    """
+    This function creates new genomes the way the first generation of
+    training does.
+
+    Arguments:
+        config -- The NEAT config
+        count {int} -- The number of genomes to create
+        seed {int} -- Seed for the random weights
+
+    Returns:
+        list -- (genome id, genome) pairs
+    """
+    random.seed(seed)
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append((key, genome))
+    return genomes
+
+
+def best_time(function, repeat):
+    """
+    This function times a function a few times and keeps the fastest run.
+
+    Arguments:
+        function -- Function to time. It may return a value to keep.
+        repeat {int} -- The number of runs
+
+    Returns:
+        tuple -- The best time in seconds and the value of the fastest run
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, value)
+    return best
+
+
+def result(name, params, seconds, **metrics):
+    """
+    This function packs the outcome of one benchmark.
+
+    Arguments:
+        name {str} -- The name of the benchmark
+        params {dict} -- The parameters it was run with
+        seconds {float} -- The time it took
+
+    Returns:
+        dict -- The result, with one entry per metric in "metrics"
+    """
+    return {"name": name, "params": params, "seconds": seconds,
+            "metrics": metrics}
+
+
+def board_params(game_config, **params):
+    """
+    This function gives the parameters of a benchmark, with the board size
+    added when it is not the usual 30 by 30, so results stay comparable with
+    baselines saved before the board size could change.
+
+    Arguments:
+        game_config {GameConfig} -- The board the benchmark ran on
+        params -- The other parameters
+
+    Returns:
+        dict -- The parameters
+    """
+    if (game_config.width, game_config.height) != (30, 30):
+        params["board"] = "{0}x{1}".format(game_config.width,
+                                           game_config.height)
+    return params
+
+
+def bench_tick(length, count, repeat, game_config):
+    grid, snake, actions = make_snake(length, game_config)
+    moves = [actions[i % len(actions)] for i in range(count)]
+
+    def run():
+        for action in moves:
+            snake.move(grid, action)
+
+    seconds, _ = best_time(run, repeat)
+    return result("tick", board_params(game_config, length=length),
+                  seconds,
+                  **{"steps/s": count / seconds})
+
+
+def bench_observe(length, count, repeat, game_config):
+    grid, snake, _ = make_snake(length, game_config)
+    food = Food(grid, *grid.free[0])
+
+    def run():
+        for _ in range(count):
+            observe(grid, snake, food)
+
+    seconds, _ = best_time(run, repeat)
+    return result("observe", board_params(game_config, length=length),
+                  seconds,
+                  **{"calls/s": count / seconds})
+
+
+def bench_decision(length, count, repeat, config, game_config):
+    grid, snake, _ = make_snake(length, game_config)
+    food = Food(grid, *grid.free[0])
+    _, genome = make_genomes(config, 1, 0)[0]
+    network = neat.nn.FeedForwardNetwork.create(genome, config)
+
+    def run():
+        for _ in range(count):
+            make_decision(network, grid, snake, food)
+
+    seconds, _ = best_time(run, repeat)
+    return result("make_decision", board_params(game_config, length=length),
+                  seconds,
+                  **{"calls/s": count / seconds})
+
+
+def bench_food(length, count, repeat, game_config):
+    grid, snake, _ = make_snake(length, game_config)
+    rng = random.Random(0)
+
+    def run():
+        for _ in range(count):
+            food = generate_food(grid, snake, rng)
+            grid.remove_pos(food.x, food.y)
+
+    seconds, _ = best_time(run, repeat)
+    return result("generate_food", board_params(game_config, length=length),
+                  seconds,
+                  **{"calls/s": count / seconds})
+
+
+def bench_has_failed(length, count, repeat, game_config):
+    grid, snake, _ = make_snake(length, game_config)
+
+    def run():
+        for _ in range(count):
+            has_failed(snake, game_config)
+
+    seconds, _ = best_time(run, repeat)
+    return result("has_failed", board_params(game_config, length=length),
+                  seconds,
+                  **{"calls/s": count / seconds})
+
+
+def bench_eval(pop_size, repeat, seed, game_config):
+    config = load_config(pop_size)
+    genomes = make_genomes(config, pop_size, seed)
+    trainAI.GAME_CONFIG = game_config
+
+    def run():
+        random.seed(seed)
+        return sum(result[2] for result in trainAI.eval(genomes, config))
+
+    seconds, steps = best_time(run, repeat)
+    return result("eval", board_params(game_config, population=pop_size),
+                  seconds,
+                  **{"genomes/s": pop_size / seconds, "steps/s": steps / seconds})
+
+
+def bench_batch(pop_size, ticks, repeat, seed, game_config):
+    config = load_config(pop_size)
+    genomes = make_genomes(config, pop_size, seed)
+    network = BatchNetwork.create([genome for _, genome in genomes], config)
+
+    def run():
+        game = BatchGame(pop_size, np.arange(pop_size) + seed, game_config)
+        steps = 0
+        for _ in range(ticks):
+            if not game.alive.any():
+                game = BatchGame(pop_size, np.arange(pop_size) + seed,
+                                 game_config)
+            steps += int(game.alive.sum())
+            outputs = network.activate(observe_batch(game))
+            game.step(outputs.argmax(axis=1))
+        return steps
+
+    seconds, steps = best_time(run, repeat)
+    return result("batch", board_params(game_config, population=pop_size),
+                  seconds,
+                  **{"steps/s": steps / seconds})
+
+
+def run_benchmarks(args):
+    """
+    This function runs every benchmark selected on the command line.
+
+    Arguments:
+        args {Namespace} -- The parsed command line options
+
+    Returns:
+        list -- The results in the order they were run
+    """
+    config = load_config(1)
+    results = []
+
+    def report(outcome):
+        params = " ".join("{0}={1}".format(k, v)
+                          for k, v in outcome["params"].items())
+        metrics = "  ".join("{0:>14,.0f} {1}".format(v, k)
+                            for k, v in outcome["metrics"].items())
+        print("{0:<14} {1:<16} {2}".format(outcome["name"], params, metrics))
+        results.append(outcome)
+
+    board = args.board
+    for length in args.lengths:
+        report(bench_tick(length, args.count, args.repeat, board))
+        report(bench_observe(length, args.count, args.repeat, board))
+        report(bench_decision(length, args.count, args.repeat, config, board))
+        report(bench_food(length, args.count, args.repeat, board))
+        report(bench_has_failed(length, args.count, args.repeat, board))
+
+    for pop_size in args.populations:
+        report(bench_eval(pop_size, args.repeat, args.seed, board))
+        report(bench_batch(pop_size, args.ticks, args.repeat, args.seed, board))
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    This function compares results with a baseline and prints the change of
+    every metric they share.
+
+    Arguments:
+        results {list} -- The new results
+        baseline {list} -- The results to compare with
+        tolerance {float} -- The fraction a metric may drop before it counts
+        as a regression
+
+    Returns:
+        int -- The number of regressions
+    """
+    def key(outcome):
+        return (outcome["name"], json.dumps(outcome["params"], sort_keys=True))
+
+    old = {key(outcome): outcome for outcome in baseline}
+    regressions = 0
+
+    print("\nCompared with baseline:")
+    for outcome in results:
+        before = old.get(key(outcome))
+        if before is None:
+            continue
+        for metric, value in outcome["metrics"].items():
+            if metric not in before["metrics"]:
+                continue
+            ratio = value / before["metrics"][metric]
+            flag = ""
+            if ratio < 1 - tolerance:
+                flag = "  REGRESSION"
+                regressions += 1
+            print("{0:<14} {1:<20} {2:<10} {3:6.2f}x{4}".format(
+                outcome["name"], key(outcome)[1], metric, ratio, flag))
+
+    return regressions
+
+
+def parse_args(argv):
+    """
+    This function reads the benchmark options from the command line.
+
+    Arguments:
+        argv {list} -- The command line arguments, without the program name
+
+    Returns:
+        Namespace -- The parsed options
+    """
+    parser = argparse.ArgumentParser(
+        description="Measure the speed of the game and of training.")
+    parser.add_argument("--lengths", type=int, nargs="+",
+                        default=[6, 100, 400, 800],
+                        help="snake lengths for the game core benchmarks")
+    parser.add_argument("--populations", type=int, nargs="+",
+                        default=[50, 200],
+                        help="population sizes for the evaluation benchmarks")
+    parser.add_argument("--count", type=int, default=20000,
+                        help="calls per game core benchmark")
+    parser.add_argument("--ticks", type=int, default=200,
+                        help="ticks per batch benchmark")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per benchmark, the fastest is kept")
+    parser.add_argument("--board", type=GameConfig.parse, metavar="WxH",
+                        default=DEFAULT_GAME,
+                        help="size of the board, e.g. 64x64, with an even "
+                        "height (default: 30x30)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for genomes and food")
+    parser.add_argument("--json", metavar="PATH",
+                        help="save the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare with results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline")
+
+    args = parser.parse_args(argv)
+    # The snakes follow a cycle that needs an even number of rows
+    if args.board.height % 2 == 1:
+        parser.error("--board needs an even height")
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    results = run_benchmarks(args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "numpy": np.__version__,
+                       "machine": platform.machine(),
+                       "seed": args.seed,
+                       "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import numpy as np
+from gamesrc.observation import PAD, BLOCKED
+from gamesrc.moves import RIGHT, STEPS, TURNS
+from gamesrc.config import DEFAULT_GAME
+
+
+# The tables of gamesrc.moves as arrays
+DIRECTIONS = np.array(STEPS, dtype=np.int64)
+TURN_TABLE = np.array(TURNS, dtype=np.int64)
+
+# Values used in the death array. DEATH_CAUSES maps them to the names used by
+# the rest of the project.
+ALIVE = 0
+DEATH_WALL = 1
+DEATH_SELF = 2
+DEATH_CAUSES = (None, "wall", "self")
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _mix(x):
+    """
+    This function scrambles 64 bit integers with the splitmix64 finalizer. It
+    is used as a counter based random number generator so every game can draw
+    its own reproducible numbers without keeping a generator object per game.
+
+    Arguments:
+        x {ndarray} -- uint64 values to scramble
+
+    Returns:
+        ndarray -- The scrambled uint64 values
+    """
+    x = (x + np.uint64(0x9E3779B97F4A7C15)) & _MASK64
+    x = ((x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)) & _MASK64
+    x = ((x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)) & _MASK64
+    return x ^ (x >> np.uint64(31))
+
+
+class BatchGame:
+    """
+    This class plays many games of snake at once. Instead of a Grid, Snake and
+    Food object per game, the state of every game is kept in stacked NumPy
+    arrays and all games are advanced together with a single call to step().
+
+    The games follow the same rules as the single game: the snake moves one
+    block per step, eating food grows it by moving its head one more block
+    forward and it dies by leaving the grid or running into itself. Games that
+    have ended are left untouched by later steps.
+
+    The board uses the same values as Grid: 0 for empty, 1 for the snake and 2
+    for food, indexed as board[game, y, x]. padded holds the same boards with
+    a border of blocked positions around them.
+    """
+
+    def __init__(self, n, seeds=None, game_config=DEFAULT_GAME):
+        """
+        This function sets up n new games.
+
+        Arguments:
+            n {int} -- The number of games to play at once
+            seeds {array} -- One seed per game for the food positions. Games
+            with the same seed spawn food in the same way. Random seeds are
+            used if it is not given.
+            game_config {GameConfig} -- The size of the boards and where food
+            can spawn
+        """
+        if seeds is None:
+            seeds = np.random.default_rng().integers(
+                0, 2 ** 63, size=n, dtype=np.uint64)
+        self.seeds = np.asarray(seeds, dtype=np.uint64).reshape(n)
+        self.n = n
+        self.config = game_config
+        self.width = game_config.width
+        self.height = game_config.height
+
+        # The body of each game is a ring buffer of (x, y) coordinates. The
+        # head is at head_ptr and the following length - 1 entries (wrapping
+        # around) are the rest of the body, in order towards the tail.
+        self.capacity = self.width * self.height + 2
+        self.body = np.zeros((n, self.capacity, 2), dtype=np.int16)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+
+        # Like Grid, the boards have a border of blocked positions and board
+        # is the part inside it.
+        self.padded = np.full((n, self.height + 2 * PAD, self.width + 2 * PAD),
+                              BLOCKED, dtype=np.int8)
+        self.board = self.padded[:, PAD:-PAD, PAD:-PAD]
+        self.board[:] = 0
+        self.head = np.zeros((n, 2), dtype=np.int64)
+        self.orientation = np.full(n, RIGHT, dtype=np.int64)
+        self.food = np.zeros((n, 2), dtype=np.int64)
+        self.food_count = np.zeros(n, dtype=np.uint64)
+
+        self.alive = np.ones(n, dtype=bool)
+        self.death = np.zeros(n, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+
+        # Same starting snake as the single game: head just left of the
+        # middle facing right, with 5 more blocks to its left.
+        x, y = game_config.start
+        for i in range(6):
+            self.body[:, i] = (x - i, y)
+            self.board[:, y, x - i] = 1
+        self.length[:] = 6
+        self.head[:] = (x, y)
+
+        self._spawn_food(np.arange(n))
+
+    def step(self, actions):
+        """
+        This function advances every game that is still running by one move.
+
+        Arguments:
+            actions {array} -- One action per game: 0 to turn left, 1 to turn
+            right and 2 to keep going forward. Entries for games that have
+            ended are ignored.
+
+        Returns:
+            tuple of ndarray -- Two boolean arrays of length n telling which
+            games ate food and which games ended during this step.
+        """
+        ate = np.zeros(self.n, dtype=bool)
+        died = np.zeros(self.n, dtype=bool)
+
+        games = np.flatnonzero(self.alive)
+        if len(games) == 0:
+            return ate, died
+
+        # Turn the snakes
+        actions = np.asarray(actions)[games]
+        orientation = TURN_TABLE[actions, self.orientation[games]]
+        self.orientation[games] = orientation
+        direction = DIRECTIONS[orientation]
+
+        # The tail leaves its block before the head moves, so the head can
+        # follow right behind it.
+        tail = self.body[games, (self.head_ptr[games] +
+                                 self.length[games] - 1) % self.capacity]
+        self.board[games, tail[:, 1], tail[:, 0]] = 0
+
+        new_head = self.head[games] + direction
+        wall, hit = self._advance_head(games, new_head)
+        self.length[games] -= 1  # the tail moved up by one block
+
+        # Eating food moves the head one more block forward to grow the snake
+        eating = ~(wall | hit) & np.all(new_head == self.food[games], axis=1)
+        eaters = games[eating]
+        if len(eaters) > 0:
+            wall_2, hit_2 = self._advance_head(
+                eaters, new_head[eating] + direction[eating])
+            wall[eating] |= wall_2
+            hit[eating] |= hit_2
+            self.score[eaters] += 1
+
+        self.steps[games] += 1
+
+        failed = wall | hit
+        self.death[games[hit]] = DEATH_SELF
+        self.death[games[wall]] = DEATH_WALL
+        self.alive[games[failed]] = False
+
+        ate[eaters] = True
+        died[games[failed]] = True
+
+        # Only games that are still running need new food
+        hungry = eaters[self.alive[eaters]]
+        if len(hungry) > 0:
+            self._spawn_food(hungry)
+
+        return ate, died
+
+    def coords(self, i):
+        """
+        This function returns the snake of one game as a list of coordinates
+        in the order head --> tail, like Snake.coords.
+
+        Arguments:
+            i {int} -- The index of the game
+
+        Returns:
+            list -- The (x, y) coordinates of the snake
+        """
+        order = (self.head_ptr[i] + np.arange(self.length[i])) % self.capacity
+        return [tuple(coord) for coord in self.body[i, order].tolist()]
+
+    def _advance_head(self, games, new_head):
+        """
+        This function adds a new head to the snakes of the given games and
+        marks it on the board.
+
+        Arguments:
+            games {ndarray} -- The indices of the games to update
+            new_head {ndarray} -- The new (x, y) head position for each game
+
+        Returns:
+            tuple of ndarray -- Whether each new head is outside the grid and
+            whether it ran into the snake's own body.
+        """
+        x, y = new_head[:, 0], new_head[:, 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+
+        hit = np.zeros(len(games), dtype=bool)
+        hit[inside] = self.board[games[inside], y[inside], x[inside]] == 1
+
+        self.head_ptr[games] = (self.head_ptr[games] - 1) % self.capacity
+        self.body[games, self.head_ptr[games]] = new_head
+        self.length[games] += 1
+        self.head[games] = new_head
+
+        mark = inside & ~hit
+        self.board[games[mark], y[mark], x[mark]] = 1
+
+        return ~inside, hit
+
+    def _uniform(self, games):
+        """
+        This function draws the next random number in [0, 1) for each of the
+        given games from its seed and the number of foods spawned so far.
+
+        Arguments:
+            games {ndarray} -- The indices of the games
+
+        Returns:
+            ndarray -- One random float per game
+        """
+        bits = _mix(self.seeds[games] ^ _mix(self.food_count[games]))
+        self.food_count[games] += np.uint64(1)
+        return (bits >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def _spawn_food(self, games):
+        """
+        This function places a new food item on a random free block of the
+        spawn area for each of the given games.
+
+        Arguments:
+            games {ndarray} -- The indices of the games that need food
+        """
+        m = self.config.spawn_margin
+        area = self.board[games, m:self.height - m, m:self.width - m]
+        free = (area == 0).reshape(len(games), -1)
+        counts = free.sum(axis=1)
+
+        # Pick the k-th free block for a random k, which is uniform over the
+        # free blocks without any retries.
+        k = (self._uniform(games) * counts).astype(np.int64)
+        index = np.argmax(np.cumsum(free, axis=1) > k[:, None], axis=1)
+
+        row = self.width - 2 * m
+        x = index % row + m
+        y = index // row + m
+
+        # A game without any free block left simply gets no more food
+        placed = counts > 0
+        self.food[games[placed], 0] = x[placed]
+        self.food[games[placed], 1] = y[placed]
+        self.food[games[~placed]] = -1
+        self.board[games[placed], y[placed], x[placed]] = 2
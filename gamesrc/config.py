@@ -0,0 +1,73 @@
+class GameConfig:
+    """
+    This class holds the settings of a game of snake that used to be fixed:
+    the size of the board, how far from the edges food spawns and how big a
+    block is drawn. The default is the original 30 by 30 board.
+    """
+
+    def __init__(self, width=30, height=30, spawn_margin=2, cell_size=None):
+        """
+        This function creates a game configuration.
+
+        Arguments:
+            width {int} -- The width of the board in blocks
+            height {int} -- The height of the board in blocks
+            spawn_margin {int} -- Food is only spawned this far away from the
+            edges, for visual reasons
+            cell_size {int} -- The size of a block on screen in pixels. By
+            default blocks are 15 pixels, or smaller so the window fits in 900
+            pixels.
+        """
+        # The starting snake is 6 blocks long, left of the middle
+        if width < 12:
+            raise ValueError("The board must be at least 12 blocks wide")
+        if min(width, height) <= 2 * spawn_margin:
+            raise ValueError("The spawn margin leaves no room for food")
+
+        self.width = width
+        self.height = height
+        self.spawn_margin = spawn_margin
+        if cell_size is None:
+            cell_size = max(1, min(15, 900 // max(width, height)))
+        self.cell_size = cell_size
+
+    @property
+    def start(self):
+        """
+        The position of the head of a new snake, (14, 15) on the 30 by 30
+        board.
+        """
+        return (self.width // 2 - 1, self.height // 2)
+
+    @property
+    def window_size(self):
+        """
+        The (width, height) of a window showing the whole board, in pixels.
+        """
+        return (self.width * self.cell_size, self.height * self.cell_size)
+
+    def __repr__(self):
+        return "GameConfig({0}x{1})".format(self.width, self.height)
+
+    @staticmethod
+    def parse(text):
+        """
+        This function reads a board size written as WIDTHxHEIGHT, e.g. 64x64,
+        or as a single number for a square board.
+
+        Arguments:
+            text {str} -- The board size
+
+        Returns:
+            GameConfig -- A configuration with that board size
+        """
+        sizes = text.lower().split("x")
+        if len(sizes) == 1:
+            sizes = sizes * 2
+        if len(sizes) != 2 or not all(size.isdigit() for size in sizes):
+            raise ValueError("Invalid board size {0!r}".format(text))
+        return GameConfig(int(sizes[0]), int(sizes[1]))
+
+
+# The original game
+DEFAULT_GAME = GameConfig()
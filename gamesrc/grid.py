@@ -1,9 +1,12 @@
 import numpy as np
+from gamesrc.observation import PAD, BLOCKED
+from gamesrc.config import DEFAULT_GAME
 
 
 class Grid:
     """
-    This class represents the 30 by 30 grid on which the snake game is played.
+    This class represents the grid on which the snake game is played, 30 by
+    30 unless another size is configured.
 
     The values veing used in this project are:
     Positions have a default value of 0 to indicate they are empty.
@@ -11,11 +14,69 @@ class Grid:
     Positions with a value of 2 represent a food item.
 
     There is no hard restriction and the values set can be changed because the
-    method implementations are generic.
+    method implementations are generic, as long as they fit in a byte.
+
+    The positions are stored in a flat buffer of bytes, one per position,
+    which is also exposed as NumPy arrays without copying it.
     """
 
-    def __init__(self):
-        self.grid = np.reshape([0] * 900, (30, 30))
+    __slots__ = ("config", "width", "height", "spawn_margin", "stride",
+                 "origin", "cells", "padded", "grid", "free", "free_index")
+
+    def __init__(self, game_config=DEFAULT_GAME):
+        """
+        This function creates an empty grid.
+
+        Arguments:
+            game_config {GameConfig} -- The size of the grid and where food
+            can spawn
+        """
+        self.config = game_config
+        self.width = game_config.width
+        self.height = game_config.height
+
+        # Food is only spawned this far away from the edges, for visual
+        # reasons.
+        self.spawn_margin = game_config.spawn_margin
+
+        # The grid is stored with a border of blocked positions around it so
+        # the NN inputs can be read without bounds checks. cells holds the
+        # padded grid row by row, and position (x, y) is at
+        # origin + y * stride + x. Reading and writing single positions goes
+        # straight to cells, which is a lot faster than indexing NumPy arrays.
+        self.stride = self.width + 2 * PAD
+        self.origin = PAD * self.stride + PAD
+        self.cells = bytearray([BLOCKED]) * (self.stride *
+                                             (self.height + 2 * PAD))
+
+        # padded and grid are NumPy views of cells for code that works on
+        # whole boards, like drawing. grid is the part inside the border.
+        self.padded = np.frombuffer(self.cells, dtype=np.uint8).reshape(
+            self.height + 2 * PAD, self.stride)
+        self.grid = self.padded[PAD:-PAD, PAD:-PAD]
+        self.grid[:] = 0
+
+        # Empty positions where food can spawn. Removing a position swaps the
+        # last one into its place and free_index maps each position to its
+        # index, so keeping this up to date and picking from it are O(1).
+        m = self.spawn_margin
+        self.free = [(x, y) for y in range(m, self.height - m)
+                     for x in range(m, self.width - m)]
+        self.free_index = {pos: i for i, pos in enumerate(self.free)}
+
+    def copy(self):
+        """
+        This method makes an independent copy of the grid, including the order
+        of its free positions, so food spawns the same way on both.
+
+        Returns:
+            Grid -- The copy
+        """
+        grid = Grid(self.config)
+        grid.cells[:] = self.cells
+        grid.free = list(self.free)
+        grid.free_index = dict(self.free_index)
+        return grid
 
     def update_pos(self, x, y, val):
         """
@@ -26,9 +87,12 @@ class Grid:
             y {int} -- Y coordinate in standard coordinate system
             val  -- The value to set to
         """
-        if x >= 0 and x <= 29 and y >= 0 and y <= 29:
-            # x and y switched for internal array coordinates
-            self.grid[y][x] = val
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[self.origin + y * self.stride + x] = val
+            if val == 0:
+                self._release(x, y)
+            else:
+                self._take(x, y)
 
     def remove_pos(self, x, y):
         """
@@ -38,9 +102,9 @@ class Grid:
             x {int} -- X coordinate in standard coordinate system
             y {int} -- Y coordinate in standard coordinate system
         """
-        if x >= 0 and x <= 29 and y >= 0 and y <= 29:
-            # x and y switched for internal array coordinates
-            self.grid[y][x] = 0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[self.origin + y * self.stride + x] = 0
+            self._release(x, y)
 
     def get_status(self, x, y):
         """
@@ -59,10 +123,39 @@ class Grid:
             1- This position is empty or has food.
 
         """
-        if x >= 0 and x <= 29 and y >= 0 and y <= 29:
-            if self.grid[y][x] != 1:  # x and y switched for internal array coordinates
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if self.cells[self.origin + y * self.stride + x] != 1:
                 return 1
             else:
                 return 0
         else:
             return 0
+
+    def _take(self, x, y):
+        """
+        This method removes a position from the free positions, if it is there.
+
+        Arguments:
+            x {int} -- X coordinate in standard coordinate system
+            y {int} -- Y coordinate in standard coordinate system
+        """
+        i = self.free_index.pop((x, y), None)
+        if i is not None:
+            last = self.free.pop()
+            if i < len(self.free):
+                self.free[i] = last
+                self.free_index[last] = i
+
+    def _release(self, x, y):
+        """
+        This method adds a position in the spawn area back to the free positions.
+
+        Arguments:
+            x {int} -- X coordinate in standard coordinate system
+            y {int} -- Y coordinate in standard coordinate system
+        """
+        m = self.spawn_margin
+        if (m <= x < self.width - m and m <= y < self.height - m
+                and (x, y) not in self.free_index):
+            self.free_index[(x, y)] = len(self.free)
+            self.free.append((x, y))
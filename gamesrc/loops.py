@@ -0,0 +1,258 @@
+import numpy as np
+from gamesrc.config import DEFAULT_GAME
+
+# Finds snakes that are going around in circles. Between two foods nothing
+# changes but the snake, and the NN always makes the same decision for the
+# same board, so once the snake is exactly where it was before (same body,
+# same orientation) it will repeat the same moves until it starves.
+#
+# Every game remembers when its head was last on each position with each
+# orientation since the last food. When the head comes back, the body is
+# compared with the body back then, so a loop is found one round after the
+# whole snake has entered it. The table has an entry for every position and
+# orientation, up to LOOP_SLOTS entries, which covers boards up to 32 by 32.
+# On bigger boards some positions share an entry and the later visit wins.
+#
+# A number tracked alongside the game, like the fitness, can be extrapolated
+# to any later move, because it changes by the same amounts in every round of
+# the loop.
+
+# Loops this many moves long or longer are not looked for
+LOOP_HISTORY = 1024
+
+# The largest number of visits remembered per game
+LOOP_SLOTS = 4096
+
+
+def _slot_count(game_config):
+    return min(4 * game_config.width * game_config.height, LOOP_SLOTS)
+
+
+class LoopDetector:
+    """
+    This class finds loops in a single game of Grid, Snake and Food objects.
+    """
+
+    def __init__(self, snake, game_config=DEFAULT_GAME, history=LOOP_HISTORY):
+        """
+        This function creates a detector for a new game.
+
+        Arguments:
+            snake {Snake} -- The snake at the start of the game
+            game_config {GameConfig} -- The board the game is played on
+            history {int} -- Loops this long or longer are not looked for
+        """
+        self.width = game_config.width
+        self.slots = _slot_count(game_config)
+        # The same limit as the body buffer of BatchGame, so both detectors
+        # find the same loops
+        self.capacity = game_config.width * game_config.height + 2
+        self.history = history
+        self.reset(snake)
+
+    def reset(self, snake, value=0.0):
+        """
+        This function starts over, which has to be done whenever the snake
+        eats.
+
+        Arguments:
+            snake {Snake} -- The snake at this point
+            value {float} -- The tracked number at this point
+        """
+        # Where the head was after every move, following the body from the
+        # tail, so the body after move s is path[s:s + length]
+        self.path = list(snake.coords)[::-1]
+        self.length = len(self.path)
+        self.step = 0
+        self.values = [value]
+        self.visits = {}
+        self.start = None
+        self.period = None
+
+    def update(self, snake, value=0.0):
+        """
+        This function checks the snake after a move in which it did not eat.
+
+        Arguments:
+            snake {Snake} -- The snake
+            value {float} -- The tracked number after the move
+
+        Returns:
+            bool -- True if the snake is in a loop
+        """
+        self.step += 1
+        self.values.append(value)
+        head = snake.coords[0]
+        self.path.append(head)
+        slot = ((head[1] * self.width + head[0]) * 4 +
+                snake.orientation) % self.slots
+
+        # The body is only compared when the head is back where it was. Equal
+        # bodies have the same head, and then the slot also means the same
+        # orientation.
+        step = self.visits.get(slot)
+        if step is not None:
+            period = self.step - step
+            length = self.length
+            if (period < self.history and period + length <= self.capacity and
+                    self.path[step:step + length] ==
+                    self.path[self.step:self.step + length]):
+                self.start = step
+                self.period = period
+                return True
+
+        self.visits[slot] = self.step
+        return False
+
+    def extrapolate(self, step):
+        """
+        This function works out the tracked number the game would reach after
+        the given number of moves since the last food, if the loop that was
+        found went on.
+
+        Arguments:
+            step {int} -- Moves since the last food, not before the loop
+
+        Returns:
+            float -- The tracked number at that move
+        """
+        cycles, offset = divmod(step - self.start, self.period)
+        gain = self.values[self.start + self.period] - self.values[self.start]
+        return self.values[self.start + offset] + cycles * gain
+
+
+class BatchLoopDetector:
+    """
+    This class finds loops in every game of a BatchGame at once. It finds the
+    same loops at the same moves as LoopDetector.
+    """
+
+    def __init__(self, game, history=LOOP_HISTORY, track=True,
+                 most_moves=None):
+        """
+        This function creates a detector for new games.
+
+        Arguments:
+            game {BatchGame} -- The games
+            history {int} -- Loops this long or longer are not looked for
+            track {bool} -- Whether a number is tracked for extrapolate()
+            most_moves {int} -- The most moves a game can make without
+            eating, if there is such a limit
+        """
+        n = game.n
+        self.game = game
+        self.history = history
+        self.slots = _slot_count(game.config)
+        self.step = np.zeros(n, dtype=np.int64)
+
+        # The tracked number after each move since the last food, kept in a
+        # ring that grows whenever a game gets further than it holds, up to
+        # history moves
+        self.values = np.zeros((n, min(64, history))) if track else None
+
+        # The move since the last food on which each slot was last visited,
+        # counted from 1, and 0 for slots not visited since then. Games that
+        # stop after a few thousand moves without food fit in 16 bits.
+        small = most_moves is not None and most_moves < 2 ** 15
+        dtype = np.int16 if small else np.int32
+        self.visits = np.zeros((n, self.slots), dtype=dtype)
+
+        self.start = np.zeros(n, dtype=np.int64)
+        self.period = np.zeros(n, dtype=np.int64)
+
+    def update(self, running, ate, values=None):
+        """
+        This function checks the games after a move.
+
+        Arguments:
+            running {ndarray} -- Which games are still running
+            ate {ndarray} -- Which games ate during the move
+            values {ndarray} -- The tracked number of every game after the
+            move, if tracked
+
+        Returns:
+            ndarray -- Which running games are in a loop
+        """
+        game = self.game
+        fed = running & ate
+        self.step[fed] = 0
+        if fed.any():
+            self.visits[fed] = 0
+
+        games = np.flatnonzero(running & ~ate)
+        self.step[games] += 1
+        if self.values is not None:
+            tracked = np.flatnonzero(running)
+            size = self.values.shape[1]
+            if size < self.history and len(tracked) and \
+                    self.step[tracked].max() >= size:
+                self._grow(min(2 * size, self.history))
+            self.values[tracked, self.step[tracked] % self.values.shape[1]] = \
+                values[tracked]
+
+        x, y = game.head[games, 0], game.head[games, 1]
+        slot = ((y * game.width + x) * 4 +
+                game.orientation[games]) % self.slots
+        step = self.step[games]
+        visited = self.visits[games, slot].astype(np.int64)
+        period = step - visited
+
+        looping = np.zeros(game.n, dtype=bool)
+        candidate = ((visited > 0) & (period < self.history) &
+                     (period + game.length[games] <= game.capacity))
+        if candidate.any():
+            # Between two foods the head moves one place down the body buffer
+            # per move, so the body back then starts period places further on.
+            c = games[candidate]
+            length = game.length[c]
+            parts = np.arange(length.max())
+            inside = parts[None, :] < length[:, None]
+            now = (game.head_ptr[c, None] + parts) % game.capacity
+            before = (now + period[candidate, None]) % game.capacity
+            equal = (game.body[c[:, None], now] ==
+                     game.body[c[:, None], before]).all(axis=2)
+            same = np.all(equal | ~inside, axis=1)
+            found = c[same]
+            looping[found] = True
+            self.period[found] = period[candidate][same]
+            self.start[found] = visited[candidate][same]
+
+        self.visits[games, slot] = step
+        return looping
+
+    def _grow(self, size):
+        """
+        This function makes the ring of tracked numbers bigger, moving the
+        numbers every game has so far to their places in the new ring.
+
+        Arguments:
+            size {int} -- The new number of moves the ring holds
+        """
+        old = self.values
+        rows = np.arange(len(old))[:, None]
+        steps = self.step[:, None] - np.arange(old.shape[1])
+        self.values = np.zeros((len(old), size))
+        self.values[rows, steps % size] = old[rows, steps % old.shape[1]]
+
+    def extrapolate(self, games, step):
+        """
+        This function works out the tracked number the given games would
+        reach after the given numbers of moves since their last food, if the
+        loops that were found went on.
+
+        Arguments:
+            games {ndarray} -- The indices of games in a loop
+            step {ndarray} -- Moves since the last food for each of them
+
+        Returns:
+            ndarray -- The tracked number of each game at that move
+        """
+        start, period = self.start[games], self.period[games]
+        cycles, offset = np.divmod(step - start, period)
+        values = self.values[games]
+        rows = np.arange(len(games))
+
+        def at(s):
+            return values[rows, s % values.shape[1]]
+
+        return at(start + offset) + cycles * (at(start + period) - at(start))
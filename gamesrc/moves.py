@@ -0,0 +1,24 @@
+# Direction and action codes shared by the game core.
+
+# Orientations are small integers. The DLUR order makes it convenient to cycle
+# through them: turning left is one index down and turning right one index up.
+DOWN, LEFT, UP, RIGHT = range(4)
+
+# Single letter names of the orientations, indexed by their code
+NAMES = ("D", "L", "U", "R")
+
+# (x, y) step taken when moving in each orientation
+STEPS = ((0, 1), (-1, 0), (0, -1), (1, 0))
+
+# Actions use the same order as the outputs of the NN
+TURN_LEFT, TURN_RIGHT, FORWARD = range(3)
+
+# TURNS[action][orientation] is the orientation after taking the action
+TURNS = (
+    tuple((o - 1) % 4 for o in range(4)),
+    tuple((o + 1) % 4 for o in range(4)),
+    tuple(range(4)),
+)
+
+# Letters accepted in place of the turn actions
+ACTION_NAMES = {"L": TURN_LEFT, "R": TURN_RIGHT}
@@ -0,0 +1,216 @@
+import numpy as np
+from gamesrc.moves import DOWN, LEFT, UP, STEPS
+
+# Builds the 11 NN inputs for a game: whether the 8 positions around the
+# snake's head are free, followed by the go_front, go_left and go_right food
+# hints. Everything that depends on the orientation is worked out once here, so
+# building the inputs is a lookup into these tables plus one gather from the
+# board.
+
+# Boards are padded with this many blocked positions on every side, so looking
+# two positions ahead of a head on the edge never leaves the array.
+PAD = 2
+
+# Value of the padding. It matches the value of the snake so walls and the
+# snake's body read the same way: not free.
+BLOCKED = 1
+
+
+def _adjacent_offsets(orientation):
+    """
+    This function works out where the 8 positions looked at by the NN are
+    relative to the head for one orientation. The order is:
+    one ahead, two ahead,
+    left, left + one ahead, left + two ahead
+    right, right + one ahead, right + two ahead
+
+    Arguments:
+        orientation {int} -- Orientation code from gamesrc.moves
+
+    Returns:
+        list -- (x, y) offsets from the head
+    """
+    fx, fy = STEPS[orientation]
+    lx, ly = STEPS[(orientation - 1) % 4]  # turning left is one index down
+    return [(fx, fy), (2 * fx, 2 * fy),
+            (lx, ly), (lx + fx, ly + fy), (lx + 2 * fx, ly + 2 * fy),
+            (-lx, -ly), (-lx + fx, -ly + fy), (-lx + 2 * fx, -ly + 2 * fy)]
+
+
+# (4, 8, 2) offsets of the adjacent positions for every orientation
+ADJACENT_OFFSETS = np.array([_adjacent_offsets(o) for o in range(4)])
+
+# Choices of the food hint: go_front, go_left or go_right
+_FRONT, _LEFT, _RIGHT = 0, 1, 2
+
+
+def _food_choice(orientation, sx, sy):
+    """
+    This function gives the food hint for an orientation and the signs of the
+    distance to the food. When the food is behind the snake it is told to
+    turn right.
+
+    Arguments:
+        orientation {int} -- Orientation code from gamesrc.moves
+        sx {int} -- Sign of the x distance from the head to the food
+        sy {int} -- Sign of the y distance from the head to the food
+
+    Returns:
+        int -- The index of the hint to set
+    """
+    if orientation == UP:
+        if sx == 0:
+            return _FRONT if sy <= 0 else _RIGHT
+        return _LEFT if sx < 0 else _RIGHT
+    elif orientation == DOWN:
+        if sx == 0:
+            return _RIGHT if sy <= 0 else _FRONT
+        return _RIGHT if sx < 0 else _LEFT
+    elif orientation == LEFT:
+        if sy == 0:
+            return _FRONT if sx <= 0 else _RIGHT
+        return _RIGHT if sy < 0 else _LEFT
+    else:  # R, which has always said go right when the food is level with it
+        if sy == 0:
+            return _RIGHT
+        return _LEFT if sy < 0 else _RIGHT
+
+
+# FOOD_HINTS[orientation, sign(dx) + 1, sign(dy) + 1] holds the three hints
+FOOD_HINTS = np.zeros((4, 3, 3, 3), dtype=np.int8)
+for _o in range(4):
+    for _sx in (-1, 0, 1):
+        for _sy in (-1, 0, 1):
+            FOOD_HINTS[_o, _sx + 1, _sy + 1, _food_choice(_o, _sx, _sy)] = 1
+
+# The same table as nested tuples, which is faster to index for one game
+_FOOD_HINT_TUPLES = tuple(
+    tuple(tuple(tuple(int(v) for v in hint) for hint in row) for row in table)
+    for table in FOOD_HINTS)
+
+
+# Flat offsets already worked out for each padded board width
+_FLAT_OFFSETS = {}
+
+
+def flat_offsets(stride):
+    """
+    This function turns the adjacent offsets into offsets into a flattened
+    padded board. The result is cached for each stride.
+
+    Arguments:
+        stride {int} -- The width of a row of the padded board
+
+    Returns:
+        ndarray -- (4, 8) offsets into the flattened padded board
+    """
+    offsets = _FLAT_OFFSETS.get(stride)
+    if offsets is None:
+        offsets = ADJACENT_OFFSETS[:, :, 1] * stride + ADJACENT_OFFSETS[:, :, 0]
+        _FLAT_OFFSETS[stride] = offsets
+    return offsets
+
+
+# The same offsets as tuples, for reading one game's cells from Python
+_FLAT_OFFSET_TUPLES = {}
+
+
+def _flat_offset_tuples(stride):
+    offsets = _FLAT_OFFSET_TUPLES.get(stride)
+    if offsets is None:
+        offsets = tuple(tuple(int(o) for o in row)
+                        for row in flat_offsets(stride))
+        _FLAT_OFFSET_TUPLES[stride] = offsets
+    return offsets
+
+
+def _sign(v):
+    return 1 if v > 0 else -1 if v < 0 else 0
+
+
+def get_adjacent(grid, x, y, orientation):
+    """
+    This function returns the status of the 8 positions adjacent to a head
+    on the given grid.
+
+    Arguments:
+        grid {Grid} -- The grid the snake is on
+        x {int} -- X coordinate of the head in standard coordinate system
+        y {int} -- Y coordinate of the head in standard coordinate system
+        orientation {int} -- Orientation code from gamesrc.moves
+
+    Returns:
+        list -- 1 for each position that is empty or has food and 0 for each
+        position that is blocked by the snake or outside the grid
+    """
+    cells = grid.cells
+    head = grid.origin + y * grid.stride + x
+    return [0 if cells[head + offset] == BLOCKED else 1
+            for offset in _flat_offset_tuples(grid.stride)[orientation]]
+
+
+def get_food_hints(orientation, dist_x, dist_y):
+    """
+    This function returns the go_front, go_left and go_right hints for the
+    given orientation and distance from the head to the food.
+
+    Arguments:
+        orientation {int} -- Orientation code from gamesrc.moves
+        dist_x {int} -- X distance from the head to the food
+        dist_y {int} -- Y distance from the head to the food
+
+    Returns:
+        tuple of int -- 1 for the way to go and 0 for the other two
+    """
+    return _FOOD_HINT_TUPLES[orientation][_sign(dist_x) + 1][_sign(dist_y) + 1]
+
+
+def observe(grid, snake, food):
+    """
+    This function builds the inputs of the NN for a single game.
+
+    Arguments:
+        grid {Grid} -- The grid being used in the game
+        snake {Snake} -- The snake being used in the game
+        food {Food} -- The food being used in the game
+
+    Returns:
+        tuple of int -- The 8 adjacent statuses followed by the 3 food hints
+    """
+    x, y = snake.coords[0]
+    orientation = snake.orientation
+    return (tuple(get_adjacent(grid, x, y, orientation)) +
+            get_food_hints(orientation, food.x - x, food.y - y))
+
+
+def observe_batch(game):
+    """
+    This function builds the inputs of the NN for every game of a BatchGame
+    at once. Rows of games that have ended hold meaningless values.
+
+    Arguments:
+        game {BatchGame} -- The games to observe
+
+    Returns:
+        ndarray -- (n, 11) int8 inputs, one row per game
+    """
+    height, width = game.board.shape[1:]
+    stride = width + 2 * PAD
+
+    # Heads of ended games can be just outside the grid, so keep them inside
+    # to stay within the padding.
+    x = np.clip(game.head[:, 0], 0, width - 1)
+    y = np.clip(game.head[:, 1], 0, height - 1)
+    head = (y + PAD) * stride + x + PAD
+    orientation = game.orientation
+
+    cells = np.take_along_axis(
+        game.padded.reshape(game.n, -1),
+        head[:, None] + flat_offsets(stride)[orientation], axis=1)
+
+    inputs = np.empty((game.n, 11), dtype=np.int8)
+    inputs[:, :8] = cells != BLOCKED
+    inputs[:, 8:] = FOOD_HINTS[orientation,
+                               np.sign(game.food[:, 0] - game.head[:, 0]) + 1,
+                               np.sign(game.food[:, 1] - game.head[:, 1]) + 1]
+    return inputs
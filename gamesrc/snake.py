@@ -1,4 +1,45 @@
-import pygame
+from collections import deque
+from gamesrc.observation import get_adjacent
+from gamesrc.moves import RIGHT, NAMES, STEPS, TURNS, ACTION_NAMES
+from gamesrc.config import DEFAULT_GAME
+
+
+class Coords:
+    """
+    This class is a read-only view of the coordinates of a snake in the order
+    head --> tail. It can be indexed, iterated and measured like a list, and
+    checking whether a position is part of the snake takes constant time.
+    """
+
+    __slots__ = ("_parts", "_cells")
+
+    def __init__(self, parts, cells):
+        """
+        This function creates the view.
+
+        Arguments:
+            parts {deque} -- The coordinates of the snake
+            cells {dict} -- The number of parts of the snake on each position
+        """
+        self._parts = parts
+        self._cells = cells
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._parts)[index]
+        return self._parts[index]
+
+    def __len__(self):
+        return len(self._parts)
+
+    def __iter__(self):
+        return iter(self._parts)
+
+    def __contains__(self, coord):
+        return coord in self._cells
+
+    def __repr__(self):
+        return repr(list(self._parts))
 
 
 class Snake:
@@ -6,30 +47,68 @@ class Snake:
     This class represents the snake in the game.
     """
 
-    def __init__(self):
+    __slots__ = ("_parts", "cells", "coords", "orientation")
+
+    # Names of the orientations the snake can face, indexed by their code
+    moves = NAMES
+
+    def __init__(self, grid=None, coords=None, orientation=RIGHT):
         """
         This instantiates the snake for the game. By default this snake will
-        spawn facing the right with it's head at (14,15) on a 30 by 30 grid.
-        """
+        spawn facing the right with it's head just left of the middle of the
+        grid, at (14,15) on a 30 by 30 grid.
 
-        # Represents the snake as a list of coordinates in the order head -->
-        # tail
-        self.coords = [(14, 15)]
-        for i in range(5):
-            self.coords.append((self.coords[i][0] - 1, self.coords[i][1]))
+        Arguments:
+            grid {Grid} -- The grid the snake is placed on. Its starting
+            positions are marked on it when given, and its size decides where
+            the snake starts.
+            coords {list} -- Coordinates to start with instead, in the order
+            head --> tail
+            orientation {int} -- The orientation code to start with
+        """
+
+        # Represents the snake as a deque of coordinates in the order head -->
+        # tail, so moving only touches its two ends.
+        if coords is None:
+            game_config = DEFAULT_GAME if grid is None else grid.config
+            self._parts = deque([game_config.start])
+            for i in range(5):
+                self._parts.append((self._parts[i][0] - 1, self._parts[i][1]))
+        else:
+            self._parts = deque(tuple(coord) for coord in coords)
+
+        # Number of parts of the snake on each position. It is kept in sync
+        # with the parts so collisions can be found without scanning the body.
+        self.cells = {}
+        for coord in self._parts:
+            self._add_cell(coord)
+            if grid is not None:
+                grid.update_pos(coord[0], coord[1], 1)
 
-        # The set of moves the snake has access to.
-        # The DLUR order makes it convinient to cycle through
-        self.moves = ["D", "L", "U", "R"]
+        # Read-only view of the parts for code that draws or inspects the snake
+        self.coords = Coords(self._parts, self.cells)
 
-        # Current orientation and corresponding index in moves
-        self.orient_index = 3
-        self.orientation = "R"
+        # Current orientation as one of the codes in gamesrc.moves
+        self.orientation = orientation
+
+    @property
+    def orient_index(self):
+        """
+        The current orientation code, under its old name.
+        """
+        return self.orientation
+
+    @property
+    def orientation_name(self):
+        """
+        The current orientation as one of "D", "L", "U" or "R".
+        """
+        return NAMES[self.orientation]
 
     def get_8_adjacent(self, grid):
         """
-        This method will returns the status of the 8 positions adjacent to the snake's head on
-        the given grid.
+        This method will returns the status of the 8 positions adjacent to the
+        snake's head on the given grid.
 
         Arguments:
            grid {Grid} -- The grid on which this snake is placed
@@ -41,14 +120,8 @@ class Snake:
            0 - snake is at this position or the position is outside boundary
            1- This position is empty or has food.
         """
-        if self.orientation == "U":
-            return self._UD_adj_handle(grid, 1)
-        elif self.orientation == "D":
-            return self._UD_adj_handle(grid, -1)
-        elif self.orientation == "L":
-            return self._LR_adj_handle(grid, 1)
-        else:
-            return self._LR_adj_handle(grid, -1)
+        x, y = self._parts[0]
+        return get_adjacent(grid, x, y, self.orientation)
 
     def tick(self, grid):
         """
@@ -60,46 +133,36 @@ class Snake:
 
         # Orientation matters when computing what is 'ahead' from the snake's
         # perpective
-        if self.orientation == "U":
-            new_head = (self.coords[0][0], self.coords[0][1] - 1)
-        elif self.orientation == "D":
-            new_head = (self.coords[0][0], self.coords[0][1] + 1)
-        elif self.orientation == "L":
-            new_head = (self.coords[0][0] - 1, self.coords[0][1])
-        else:
-            new_head = (self.coords[0][0] + 1, self.coords[0][1])
+        x, y = self._parts[0]
+        dx, dy = STEPS[self.orientation]
+        new_head = (x + dx, y + dy)
 
         # The new head position is added, the old head is a part fo the body and
         # the current tail is removed.
-        grid.remove_pos(self.coords[-1][0], self.coords[-1][1])
-        self.coords = [new_head] + self.coords[:-1]
+        tail = self._parts.pop()
+        grid.remove_pos(tail[0], tail[1])
+        self._remove_cell(tail)
+        self._parts.appendleft(new_head)
+        self._add_cell(new_head)
         grid.update_pos(new_head[0], new_head[1], 1)
 
     def move(self, grid, mv):
         """
-        This function moves the snake by one space to the left or right. Left and
-        right is relative to whichever way the snake is facing.
+        This function moves the snake by one space to the left or right, or
+        straight ahead. Left and right is relative to whichever way the snake is
+        facing.
 
         Arguments:
               grid {Grid} -- The grid on which the snake is present
-              mv {str} -- The direction to move in. 'L' for left and 'R' for right.
-              Behaviour undefined for any other input.
-        """
-
-        # Moves variable allows us to conveniently cycle between orientations
-        if mv == "L":
-            if self.orient_index != 0:
-                self.orient_index -= 1
-            else:
-                self.orient_index = 3
-        elif mv == "R":
-            if self.orient_index != 3:
-                self.orient_index += 1
-            else:
-                self.orient_index = 0
+              mv {int} -- The action to take: 0 to turn left, 1 to turn right
+              and 2 to go forward, the same order as the NN outputs. 'L' and
+              'R' are accepted for left and right as well.
+        """
+        if mv.__class__ is str:
+            mv = ACTION_NAMES[mv]
 
         # turn the snake then move it
-        self.orientation = self.moves[self.orient_index]
+        self.orientation = TURNS[mv][self.orientation]
         self.tick(grid)
 
     def elongate(self, grid):
@@ -109,20 +172,26 @@ class Snake:
         Arguments:
             grid {Grid} -- The grid on which the snake is placed.
         """
-        old_head = self.coords[0]
+        x, y = self._parts[0]
+
+        # Add the new head to the coordinates representing the snake.
+        # The added head is one step ahead in the current orientation
+        dx, dy = STEPS[self.orientation]
+        new_head = (x + dx, y + dy)
 
-        # Add the new head to the list of coordinates representing the snake.
-        # The added head is calculated differently based on orientation
-        if self.orientation == "U":
-            self.coords = [(old_head[0], old_head[1] - 1)] + self.coords
-        elif self.orientation == "D":
-            self.coords = [(old_head[0], old_head[1] + 1)] + self.coords
-        elif self.orientation == "L":
-            self.coords = [(old_head[0] - 1, old_head[1])] + self.coords
-        elif self.orientation == "R":
-            self.coords = [(old_head[0] + 1, old_head[1])] + self.coords
+        self._parts.appendleft(new_head)
+        self._add_cell(new_head)
+        grid.update_pos(new_head[0], new_head[1], 1)
+
+    def hit_itself(self):
+        """
+        This method checks to see if the head of the snake is on the same
+        position as another part of its body.
 
-        grid.update_pos(self.coords[0][0], self.coords[0][1], 1)
+        Returns:
+              boolean -- True if the snake ran into itself and False otherwise
+        """
+        return self.cells[self._parts[0]] > 1
 
     def collide(self, food):
         """
@@ -136,67 +205,30 @@ class Snake:
         Returns:
               boolean -- True if collision occured and False otherwise
         """
-        if food.x == self.coords[0][0] and food.y == self.coords[0][1]:
+        head = self._parts[0]
+        if food.x == head[0] and food.y == head[1]:
             return True
         else:
             return False
 
-    def _UD_adj_handle(self, grid, i):
+    def _add_cell(self, coord):
         """
-        This function does some relative math to figure out what the 8 adjacent
-        positions are for when the snake is oriented upwards or downwards
+        This method records that a part of the snake is now on the given position.
 
         Arguments:
-              grid {Grid} -- The grid on which the snake is present
-              i {int} -- Enter 1 for U orientation and -1 for D.
+              coord {tuple} -- The (x, y) position
+        """
+        self.cells[coord] = self.cells.get(coord, 0) + 1
 
-        Returns:
-              list -- The list of 8 adjacent positions. The order is:
-              one ahead, two ahead,
-              left, left + one ahead, left + two ahead
-              right, right + one ahead, right + two ahead
-        """
-        one = grid.get_status(self.coords[0][0], self.coords[0][1] - i)
-        two = grid.get_status(self.coords[0][0], self.coords[0][1] - 2 * i)
-        three = grid.get_status(self.coords[0][0] - i, self.coords[0][1])
-        four = grid.get_status(self.coords[0][0] - i, self.coords[0][1] - i)
-        five = grid.get_status(
-            self.coords[0][0] - i,
-            self.coords[0][1] - 2 * i)
-        six = grid.get_status(self.coords[0][0] + i, self.coords[0][1])
-        seven = grid.get_status(self.coords[0][0] + i, self.coords[0][1] - i)
-        eight = grid.get_status(
-            self.coords[0][0] + i,
-            self.coords[0][1] - 2 * i)
-
-        return [one, two, three, four, five, six, seven, eight]
-
-    def _LR_adj_handle(self, grid, i):
-        """
-        This function does some relative math to figure out what the 8 adjacent
-        positions are for when the snake is oriented left or right.
+    def _remove_cell(self, coord):
+        """
+        This method records that a part of the snake has left the given position.
 
         Arguments:
-              grid {Grid} -- The grid on which the snake is present
-              y {int} -- Enter 1 for L orientation and -1 for R.
-
-        Returns:
-              list -- The list of 8 adjacent positions. The order is:
-              one ahead, two ahead,
-              left, left + one ahead, left + two ahead
-              right, right + one ahead, right + two ahead
-        """
-        one = grid.get_status(self.coords[0][0] - i, self.coords[0][1])
-        two = grid.get_status(self.coords[0][0] - 2 * i, self.coords[0][1])
-        three = grid.get_status(self.coords[0][0], self.coords[0][1] + i)
-        four = grid.get_status(self.coords[0][0] - i, self.coords[0][1] + i)
-        five = grid.get_status(
-            self.coords[0][0] - 2 * i,
-            self.coords[0][1] + i)
-        six = grid.get_status(self.coords[0][0], self.coords[0][1] - i)
-        seven = grid.get_status(self.coords[0][0] - i, self.coords[0][1] - i)
-        eight = grid.get_status(
-            self.coords[0][0] - 2 * i,
-            self.coords[0][1] - i)
-
-        return [one, two, three, four, five, six, seven, eight]
+              coord {tuple} -- The (x, y) position
+        """
+        count = self.cells[coord] - 1
+        if count:
+            self.cells[coord] = count
+        else:
+            del self.cells[coord]
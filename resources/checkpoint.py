@@ -0,0 +1,174 @@
+import os
+import re
+import gzip
+import pickle
+import random
+import threading
+from itertools import count
+from neat.population import Population
+from neat.reporting import BaseReporter
+
+# Saves the state of a training run every few generations so it can be resumed
+# after a crash. This follows neat.Checkpointer, but only the pickling happens
+# during training: compressing and writing the file is done by a background
+# thread while the next generation is evaluated.
+
+CHECKPOINT_PREFIX = "neat-checkpoint-"
+
+
+class AsyncCheckpointer(BaseReporter):
+    """
+    This class is a NEAT reporter that saves the population, species, random
+    state and statistics at the end of every few generations.
+    """
+
+    def __init__(self, directory, generation_interval=5, stats=None):
+        """
+        This function creates the checkpointer.
+
+        Arguments:
+            directory {str} -- Folder to save the checkpoints in
+            generation_interval {int} -- The number of generations between two
+            checkpoints
+            stats {StatisticsReporter} -- Statistics to save along with the
+            population, if any
+        """
+        self.directory = directory
+        self.generation_interval = generation_interval
+        self.stats = stats
+        self.population = None
+        self.generation = None
+        self._writer = None
+
+    def watch(self, population):
+        """
+        This function gives the checkpointer the population it saves. NEAT
+        reporters are not told about the best genome seen so far, so it is
+        read from the population itself.
+
+        Arguments:
+            population {Population} -- The population being trained
+        """
+        self.population = population
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def end_generation(self, config, population, species_set):
+        # The population passed in is the one for the next generation
+        generation = self.generation + 1
+        if generation % self.generation_interval == 0:
+            self.save(config, population, species_set, generation)
+
+    def save(self, config, population, species_set, generation):
+        """
+        This function takes a snapshot of the training state and writes it
+        to a file in the background.
+
+        Arguments:
+            config -- The NEAT config
+            population {dict} -- The genomes of the next generation
+            species_set -- The species of the next generation
+            generation {int} -- The number of the next generation
+        """
+        best_genome = None
+        if self.population is not None:
+            best_genome = self.population.best_genome
+
+        # The species set keeps the reporters, which include this one and
+        # cannot be pickled. They are put back when the checkpoint is loaded.
+        reporters = species_set.reporters
+        species_set.reporters = None
+        try:
+            data = pickle.dumps(
+                (generation, config, population, species_set,
+                 random.getstate(), best_genome, self.stats),
+                protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            species_set.reporters = reporters
+
+        # Only one file is written at a time, so checkpoints are finished in
+        # the order they were taken.
+        self.wait()
+        path = os.path.join(self.directory,
+                            "{0}{1}".format(CHECKPOINT_PREFIX, generation))
+        print("Saving checkpoint to {0}".format(path))
+        self._writer = threading.Thread(target=_write, args=(path, data))
+        self._writer.start()
+
+    def wait(self):
+        """
+        This function blocks until the last checkpoint has been written.
+        """
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+
+def _write(path, data):
+    """
+    This function compresses a pickled checkpoint and writes it. It writes to
+    a temporary file first, so a crash never leaves a partial checkpoint.
+
+    Arguments:
+        path {str} -- The file to write
+        data {bytes} -- The pickled checkpoint
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(gzip.compress(data, compresslevel=5))
+    os.replace(temp_path, path)
+
+
+def latest_checkpoint(directory):
+    """
+    This function finds the checkpoint of the latest generation in a folder.
+
+    Arguments:
+        directory {str} -- The folder the checkpoints were saved in
+
+    Returns:
+        str -- The path of the latest checkpoint, or None if there is none
+    """
+    if not os.path.isdir(directory):
+        return None
+
+    pattern = re.compile(re.escape(CHECKPOINT_PREFIX) + r"(\d+)$")
+    latest = None
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match and (latest is None or int(match.group(1)) > latest[0]):
+            latest = (int(match.group(1)), name)
+
+    if latest is None:
+        return None
+    return os.path.join(directory, latest[1])
+
+
+def restore_checkpoint(path):
+    """
+    This function loads a checkpoint and rebuilds the population it was taken
+    from. The random state is restored as well, so the run continues the way
+    it would have without stopping.
+
+    Arguments:
+        path {str} -- The checkpoint to load
+
+    Returns:
+        tuple -- The Population and the saved StatisticsReporter, which is
+        None if no statistics were saved
+    """
+    with gzip.open(path) as f:
+        (generation, config, population, species_set, random_state,
+         best_genome, stats) = pickle.load(f)
+
+    random.setstate(random_state)
+    restored = Population(config, (population, species_set, generation))
+    restored.best_genome = best_genome
+    species_set.reporters = restored.reporters
+
+    # New genomes must not reuse the keys of the ones that were loaded
+    restored.reproduction.genome_indexer = count(max(population) + 1)
+
+    return restored, stats
@@ -0,0 +1,113 @@
+import hashlib
+from collections import OrderedDict
+from neat.reporting import BaseReporter
+
+# Remembers the results of genomes that were already evaluated. NEAT keeps the
+# best genomes of each species unchanged from one generation to the next, and
+# crossover sometimes produces a copy of a parent. When every generation plays
+# the same games, those genomes would earn exactly the same fitness again, so
+# their results are looked up instead of playing their games again.
+
+
+def genome_hash(genome):
+    """
+    This function computes a hash of everything about a genome that affects
+    its NN: its nodes with their settings and its enabled connections with
+    their weights. Genomes with different keys but the same genes get the
+    same hash.
+
+    Arguments:
+        genome -- The genome
+
+    Returns:
+        bytes -- The hash
+    """
+    nodes = sorted((key, node.bias, node.response, node.activation,
+                    node.aggregation) for key, node in genome.nodes.items())
+    connections = sorted((key, connection.weight)
+                         for key, connection in genome.connections.items()
+                         if connection.enabled)
+    return hashlib.blake2b(repr((nodes, connections)).encode(),
+                           digest_size=16).digest()
+
+
+class FitnessCache(BaseReporter):
+    """
+    This class is a bounded cache of evaluation results, keyed by the hash of
+    a genome and the games it played. When it is full, the entry used least
+    recently is dropped. It is a NEAT reporter so it can print how many
+    genomes of each generation were looked up instead of evaluated.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        This function creates an empty cache.
+
+        Arguments:
+            max_size {int} -- The largest number of results kept
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(genome, games):
+        """
+        This function builds the key of a genome's result.
+
+        Arguments:
+            genome -- The genome
+            games -- Anything else the result depends on, such as the seeds
+            of the games it plays, as a hashable value
+
+        Returns:
+            tuple -- The key
+        """
+        return (genome_hash(genome), games)
+
+    def get(self, key):
+        """
+        This function looks up a result and counts a hit or a miss.
+
+        Arguments:
+            key {tuple} -- The key from FitnessCache.key
+
+        Returns:
+            The result, or None if it is not in the cache
+        """
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        """
+        This function stores a result, dropping the least recently used one
+        if the cache is full.
+
+        Arguments:
+            key {tuple} -- The key from FitnessCache.key
+            result -- The result to store
+        """
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def start_generation(self, generation):
+        self.hits = 0
+        self.misses = 0
+
+    def post_evaluate(self, config, population, species, best_genome):
+        lookups = self.hits + self.misses
+        print(" Fitness cache: {0} of {1} genomes reused ({2:.1%}), {3} "
+              "results cached".format(self.hits, lookups,
+                                      self.hits / lookups if lookups else 0.0,
+                                      len(self.entries)))
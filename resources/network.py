@@ -0,0 +1,457 @@
+import zipfile
+import numpy as np
+
+# Vectorized versions of neat-python's activation functions. They clamp their
+# inputs the same way so the outputs match FeedForwardNetwork.activate.
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def _tanh(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def _sin(z):
+    return np.sin(np.clip(5.0 * z, -60.0, 60.0))
+
+
+def _gauss(z):
+    return np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2)
+
+
+def _relu(z):
+    return np.where(z > 0.0, z, 0.0)
+
+
+def _softplus(z):
+    return 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def _identity(z):
+    return z
+
+
+def _clamped(z):
+    return np.clip(z, -1.0, 1.0)
+
+
+def _inv(z):
+    with np.errstate(divide="ignore"):
+        return np.where(z == 0.0, 0.0, 1.0 / z)
+
+
+def _log(z):
+    return np.log(np.maximum(z, 1e-7))
+
+
+def _exp(z):
+    return np.exp(np.clip(z, -60.0, 60.0))
+
+
+def _hat(z):
+    return np.maximum(0.0, 1 - np.abs(z))
+
+
+ACTIVATIONS = {
+    "sigmoid": _sigmoid,
+    "tanh": _tanh,
+    "sin": _sin,
+    "gauss": _gauss,
+    "relu": _relu,
+    "softplus": _softplus,
+    "identity": _identity,
+    "clamped": _clamped,
+    "inv": _inv,
+    "log": _log,
+    "exp": _exp,
+    "abs": np.abs,
+    "hat": _hat,
+    "square": np.square,
+    "cube": lambda z: z ** 3,
+}
+
+# Activation names in the order of the codes stored in a BatchNetwork
+ACTIVATION_NAMES = tuple(ACTIVATIONS)
+
+
+class BatchNetwork:
+    """
+    This class evaluates the feed forward NNs of many genomes together with
+    NumPy, giving the same outputs as neat-python's FeedForwardNetwork.
+
+    Every network is laid out on the same numbered slots: the inputs come
+    first, then the outputs, then the hidden nodes. A network is stored as a
+    weight matrix between its slots plus the bias, response, activation and
+    depth of each slot, padded to the size of the largest network. Nodes are
+    evaluated one depth at a time, so a whole population of networks can be
+    activated with a handful of matrix products.
+
+    Only the sum aggregation is supported.
+    """
+
+    def __init__(self, weights, biases, responses, activations, depths,
+                 num_inputs, num_outputs):
+        """
+        This function builds the batch from already compiled arrays. Use
+        BatchNetwork.create to build it from genomes.
+
+        Arguments:
+            weights {ndarray} -- (networks, slots, slots) matrix where
+            weights[p, j, i] is the weight from slot i to slot j
+            biases {ndarray} -- (networks, slots) bias of each node
+            responses {ndarray} -- (networks, slots) response of each node
+            activations {ndarray} -- (networks, slots) activation code of each
+            node, indexing ACTIVATION_NAMES
+            depths {ndarray} -- (networks, slots) layer of each node, 0 for
+            inputs and nodes that are never evaluated
+            num_inputs {int} -- The number of network inputs
+            num_outputs {int} -- The number of network outputs
+        """
+        self.weights = weights
+        self.biases = biases
+        self.responses = responses
+        self.activations = activations
+        self.depths = depths
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+
+        # Work out once which slots are evaluated at each depth and with which
+        # activation functions.
+        self.layers = []
+        for depth in range(1, int(depths.max(initial=0)) + 1):
+            mask = depths == depth
+            codes = np.unique(activations[mask])
+            self.layers.append((mask, [(ACTIVATIONS[ACTIVATION_NAMES[c]],
+                                        mask & (activations == c))
+                                       for c in codes]))
+
+    def __len__(self):
+        return len(self.weights)
+
+    def select(self, indices):
+        """
+        This function makes a smaller batch out of some of the networks.
+
+        Arguments:
+            indices {array} -- The indices of the networks to keep, in order
+
+        Returns:
+            BatchNetwork -- The chosen networks
+        """
+        return BatchNetwork(self.weights[indices], self.biases[indices],
+                            self.responses[indices], self.activations[indices],
+                            self.depths[indices], self.num_inputs,
+                            self.num_outputs)
+
+    def save(self, path):
+        """
+        This function saves the networks as an uncompressed .npz file of
+        plain arrays. Activation functions are stored by name, so the file
+        does not depend on the codes used by this version of the module.
+
+        Arguments:
+            path -- The file name or open binary file to write
+        """
+        np.savez(path, weights=self.weights, biases=self.biases,
+                 responses=self.responses, activations=self.activations,
+                 depths=self.depths, activation_names=np.array(ACTIVATION_NAMES),
+                 num_inputs=self.num_inputs, num_outputs=self.num_outputs)
+
+    @staticmethod
+    def load(path, mmap=False):
+        """
+        This function loads networks saved with save(). neat-python is not
+        needed for this.
+
+        Arguments:
+            path {str} -- The file to read
+            mmap {bool} -- Whether to memory-map the arrays from the file
+            instead of reading them
+
+        Returns:
+            BatchNetwork -- The loaded networks
+        """
+        if mmap:
+            arrays = _memmap_npz(path)
+        else:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+
+        # Translate the stored activation codes into the current ones
+        names = [str(name) for name in arrays["activation_names"]]
+        for name in names:
+            if name not in ACTIVATIONS:
+                raise ValueError("Unsupported activation {0!r}".format(name))
+        codes = np.array([ACTIVATION_NAMES.index(name) for name in names],
+                         dtype=np.int64)
+
+        return BatchNetwork(arrays["weights"], arrays["biases"],
+                            arrays["responses"], codes[arrays["activations"]],
+                            arrays["depths"], int(arrays["num_inputs"]),
+                            int(arrays["num_outputs"]))
+
+    def activate(self, inputs):
+        """
+        This function activates every network with its own inputs.
+
+        Arguments:
+            inputs {array} -- Inputs of shape (networks, num_inputs) or
+            (networks, games, num_inputs) to activate each network on several
+            sets of inputs at once
+
+        Returns:
+            ndarray -- The outputs, shaped like the inputs but with
+            num_outputs values in the last axis
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        squeeze = inputs.ndim == 2
+        if squeeze:
+            inputs = inputs[:, None, :]
+
+        if inputs.shape[2] != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(
+                self.num_inputs, inputs.shape[2]))
+
+        networks, games = inputs.shape[:2]
+        slots = self.weights.shape[1]
+        values = np.zeros((networks, games, slots))
+        values[:, :, :self.num_inputs] = inputs
+
+        biases = self.biases[:, None, :]
+        responses = self.responses[:, None, :]
+        for mask, functions in self.layers:
+            totals = biases + responses * np.einsum(
+                "pji,pgi->pgj", self.weights, values)
+            for function, function_mask in functions:
+                where = function_mask[:, None, :]
+                values = np.where(where, function(totals), values)
+
+        outputs = values[:, :, self.num_inputs:self.num_inputs + self.num_outputs]
+        return outputs[:, 0] if squeeze else outputs
+
+    @staticmethod
+    def create(genomes, config):
+        """
+        This function compiles the NNs of the given genomes into a batch.
+
+        Arguments:
+            genomes {list} -- The genomes to compile, in the order their
+            networks should have in the batch
+            config -- The NEAT config used to build the NNs
+
+        Returns:
+            BatchNetwork -- The compiled networks
+        """
+        from neat.graphs import feed_forward_layers
+
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+
+        plans = []
+        for genome in genomes:
+            connections = [cg.key for cg in genome.connections.values()
+                           if cg.enabled]
+            layers = feed_forward_layers(input_keys, output_keys, connections)
+
+            slot = {key: i for i, key in enumerate(input_keys + output_keys)}
+            depth = {}
+            for d, layer in enumerate(layers, start=1):
+                for node in sorted(layer):
+                    if node not in slot:
+                        slot[node] = len(slot)
+                    depth[node] = d
+            plans.append((genome, connections, slot, depth))
+
+        size = max([len(plan[2]) for plan in plans] +
+                   [len(input_keys) + len(output_keys)])
+        count = len(plans)
+        weights = np.zeros((count, size, size))
+        biases = np.zeros((count, size))
+        responses = np.ones((count, size))
+        activations = np.zeros((count, size), dtype=np.int64)
+        depths = np.zeros((count, size), dtype=np.int64)
+
+        for p, (genome, connections, slot, depth) in enumerate(plans):
+            for node, d in depth.items():
+                ng = genome.nodes[node]
+                if ng.aggregation != "sum":
+                    raise ValueError(
+                        "Unsupported aggregation {0!r}".format(ng.aggregation))
+                if ng.activation not in ACTIVATIONS:
+                    raise ValueError(
+                        "Unsupported activation {0!r}".format(ng.activation))
+
+                j = slot[node]
+                biases[p, j] = ng.bias
+                responses[p, j] = ng.response
+                activations[p, j] = ACTIVATION_NAMES.index(ng.activation)
+                depths[p, j] = d
+
+            for inode, onode in connections:
+                if onode in depth:
+                    weights[p, slot[onode], slot[inode]] = \
+                        genome.connections[(inode, onode)].weight
+
+        return BatchNetwork(weights, biases, responses, activations, depths,
+                            len(input_keys), len(output_keys))
+
+
+class Network:
+    """
+    This class is a single NN that can be used in place of neat-python's
+    FeedForwardNetwork. It runs on NumPy alone, so a saved network can be
+    loaded and played without importing neat-python.
+    """
+
+    def __init__(self, batch):
+        """
+        This function wraps a batch holding a single network.
+
+        Arguments:
+            batch {BatchNetwork} -- The network
+        """
+        if len(batch) != 1:
+            raise ValueError("Expected 1 network, got {0}".format(len(batch)))
+        self.batch = batch
+
+    def activate(self, inputs):
+        """
+        This function activates the network.
+
+        Arguments:
+            inputs {list} -- The input values
+
+        Returns:
+            list -- The output values
+        """
+        return self.batch.activate([inputs])[0].tolist()
+
+    def save(self, path):
+        """
+        This function saves the network, see BatchNetwork.save.
+
+        Arguments:
+            path -- The file name or open binary file to write
+        """
+        self.batch.save(path)
+
+    @staticmethod
+    def load(path, mmap=False):
+        """
+        This function loads a network saved with save().
+
+        Arguments:
+            path {str} -- The file to read
+            mmap {bool} -- Whether to memory-map the arrays from the file
+
+        Returns:
+            Network -- The loaded network
+        """
+        return Network(BatchNetwork.load(path, mmap))
+
+    @staticmethod
+    def create(genome, config):
+        """
+        This function builds the NN of a genome.
+
+        Arguments:
+            genome -- The genome
+            config -- The NEAT config used to build the NN
+
+        Returns:
+            Network -- The network
+        """
+        return Network(BatchNetwork.create([genome], config))
+
+    @staticmethod
+    def from_feed_forward(net):
+        """
+        This function converts a neat-python FeedForwardNetwork, such as the
+        one pickled in best_model.pickle, so it can be saved in the NumPy
+        format.
+
+        Arguments:
+            net {FeedForwardNetwork} -- The network to convert
+
+        Returns:
+            Network -- The same network
+        """
+        slot = {key: i for i, key in enumerate(net.input_nodes + net.output_nodes)}
+        for node, _, _, _, _, _ in net.node_evals:
+            if node not in slot:
+                slot[node] = len(slot)
+
+        size = len(slot)
+        weights = np.zeros((1, size, size))
+        biases = np.zeros((1, size))
+        responses = np.ones((1, size))
+        activations = np.zeros((1, size), dtype=np.int64)
+        depths = np.zeros((1, size), dtype=np.int64)
+
+        # Nodes are listed in the order they are evaluated, so the depth of
+        # every node they read from is already known.
+        depth = {key: 0 for key in net.input_nodes}
+        for node, act_func, agg_func, bias, response, links in net.node_evals:
+            aggregation = agg_func.__name__.replace("_aggregation", "")
+            if aggregation != "sum":
+                raise ValueError(
+                    "Unsupported aggregation {0!r}".format(aggregation))
+            activation = act_func.__name__.replace("_activation", "")
+            if activation not in ACTIVATIONS:
+                raise ValueError(
+                    "Unsupported activation {0!r}".format(activation))
+
+            depth[node] = 1 + max([depth.get(i, 0) for i, _ in links],
+                                  default=0)
+            j = slot[node]
+            biases[0, j] = bias
+            responses[0, j] = response
+            activations[0, j] = ACTIVATION_NAMES.index(activation)
+            depths[0, j] = depth[node]
+            for i, weight in links:
+                weights[0, j, slot[i]] = weight
+
+        return Network(BatchNetwork(weights, biases, responses, activations,
+                                    depths, len(net.input_nodes),
+                                    len(net.output_nodes)))
+
+
+def _memmap_npz(path):
+    """
+    This function memory-maps every array of an uncompressed .npz file. An
+    .npz file is a zip archive of .npy files, so each array is mapped from
+    where its data starts inside the archive.
+
+    Arguments:
+        path {str} -- The file to map
+
+    Returns:
+        dict -- The arrays by name
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(path + " is compressed and cannot be mapped")
+
+            # The local header is 30 bytes followed by the file name and an
+            # extra field whose lengths are stored at bytes 26 and 28.
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+
+            if np.lib.format.read_magic(f) == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError("Cannot map object array " + name)
+            arrays[name] = np.memmap(
+                f, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C")
+    return arrays
@@ -0,0 +1,159 @@
+import json
+import time
+from contextlib import contextmanager
+from neat.reporting import BaseReporter
+
+# Lightweight instrumentation for training. The game loop calls lap() after
+# each phase of a move, which adds the time since the previous lap to that
+# phase. When profiling is off a NullProfiler is used instead, whose methods do
+# nothing.
+
+
+class Profiler:
+    """
+    This class adds up the time spent in named phases and keeps named counters.
+    """
+
+    def __init__(self):
+        self.times = {}
+        self.counts = {}
+        # Seconds spent on work that is not part of the evaluation, like
+        # replaying a genome on screen
+        self.excluded = 0.0
+        self._last = time.perf_counter()
+
+    def start(self):
+        """
+        This function starts timing from now, so the next lap does not include
+        anything that happened before.
+        """
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        This function adds the time since the previous lap to a phase.
+
+        Arguments:
+            phase {str} -- The name of the phase that just ended
+        """
+        now = time.perf_counter()
+        self.times[phase] = self.times.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, name, amount=1):
+        """
+        This function adds to a counter.
+
+        Arguments:
+            name {str} -- The name of the counter
+            amount {int} -- How much to add
+        """
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    @contextmanager
+    def paused(self):
+        """
+        This function leaves the time spent in a with block out of the
+        evaluation time, for work that is not part of the evaluation. Laps
+        should not be taken inside the block.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.excluded += time.perf_counter() - started
+            self.start()
+
+    def reset(self):
+        """
+        This function clears all times and counters.
+        """
+        self.times.clear()
+        self.counts.clear()
+        self.excluded = 0.0
+        self.start()
+
+
+class NullProfiler:
+    """
+    This class has the same methods as Profiler but records nothing.
+    """
+
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    @contextmanager
+    def paused(self):
+        yield
+
+    def reset(self):
+        pass
+
+
+class ProfileReporter(BaseReporter):
+    """
+    This class is a NEAT reporter that prints a breakdown of where the time of
+    each generation's evaluation went, and optionally appends it to a log file
+    as one JSON object per line.
+
+    It expects the evaluation to count "games", "steps" and one "death: <cause>"
+    counter per way a game can end, and to time its phases with lap().
+    """
+
+    def __init__(self, profiler, log_path=None):
+        """
+        This function creates the reporter.
+
+        Arguments:
+            profiler {Profiler} -- The profiler used by the evaluation
+            log_path {str} -- File to append the breakdowns to, if given
+        """
+        self.profiler = profiler
+        self.log_path = log_path
+        self.generation = None
+        self.started = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.profiler.reset()
+        self.started = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        elapsed = (time.perf_counter() - self.started -
+                   self.profiler.excluded)
+        counts = dict(self.profiler.counts)
+        times = dict(self.profiler.times)
+
+        steps = counts.get("steps", 0)
+        games = counts.get("games", 0)
+        phase_total = sum(times.values())
+
+        print(" Evaluation: {0:,} moves in {1:.2f} sec ({2:,.0f} moves/sec), "
+              "mean game length {3:.1f}".format(
+                  steps, elapsed, steps / elapsed if elapsed else 0.0,
+                  steps / games if games else 0.0))
+
+        if phase_total:
+            shares = sorted(times.items(), key=lambda item: -item[1])
+            print(" Time per phase: " + ", ".join(
+                "{0} {1:.1%}".format(phase, t / phase_total)
+                for phase, t in shares))
+
+        deaths = {name[len("death: "):]: n for name, n in counts.items()
+                  if name.startswith("death: ")}
+        if deaths:
+            print(" Games ended by: " + ", ".join(
+                "{0} {1}".format(cause, n) for cause, n in sorted(deaths.items())))
+
+        if self.log_path is not None:
+            entry = {"generation": self.generation, "seconds": elapsed,
+                     "steps": steps, "games": games, "phases": times,
+                     "counts": counts}
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
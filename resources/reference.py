@@ -1,21 +1,67 @@
-import pygame
+import os
+import sys
 
 # Contains the global variables that are common in various parts of the program
 
-pygame.init()
-game_clock = pygame.time.Clock()
+# Importing this module has no side effects: pygame is only imported and the
+# window, clock and font are only created by init_display(), which the
+# programs call before they first draw. Until then they are None.
+
+# In headless mode nothing is drawn. It is turned on with the --headless
+# command line flag or by setting the SNAKE_HEADLESS environment variable to 1.
+HEADLESS = "--headless" in sys.argv or os.environ.get("SNAKE_HEADLESS") == "1"
+
+game_clock = None
 
 WIN_WIDTH = 450
 WIN_HEIGHT = 450
-WINDOW = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+WINDOW = None
+
+STAT_FONT = None
+
+
+def init_display(width=WIN_WIDTH, height=WIN_HEIGHT):
+    """
+    This function initializes pygame, opens the game window and creates the
+    clock and font used for drawing. Calling it again once the window exists
+    only resizes the window if a different size is asked for.
+
+    Arguments:
+        width {int} -- The width of the window in pixels
+        height {int} -- The height of the window in pixels
+
+    Returns:
+        Surface -- The active PyGame window
+    """
+    global game_clock, WINDOW, STAT_FONT
+
+    import pygame
+
+    if WINDOW is None:
+        pygame.init()
+        WINDOW = pygame.display.set_mode((width, height))
+        game_clock = pygame.time.Clock()
+        STAT_FONT = pygame.font.SysFont("comicsans", 50)
+    elif WINDOW.get_size() != (width, height):
+        WINDOW = pygame.display.set_mode((width, height))
+
+    return WINDOW
 
-ANIMATION_TICK = 25  # used to switch food colors
 
-SNAKE_IMG = pygame.Surface((15, 15))
-SNAKE_IMG.fill((0, 255, 0))
+def handle_events():
+    """
+    This function processes the events of the game window and closes the
+    program when the window is closed.
 
-FOOD_RGB = (255, 0, 0)
-FOOD_IMG = pygame.Surface((15, 15))
-FOOD_IMG.fill((FOOD_RGB))
+    Returns:
+        list -- The other events, for programs that react to key presses
+    """
+    import pygame
 
-STAT_FONT = pygame.font.SysFont("comicsans", 50)
+    events = []
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            quit()
+        events.append(event)
+    return events
@@ -0,0 +1,284 @@
+import io
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+from resources.network import Network
+from gamesrc.config import DEFAULT_GAME
+
+# Training needs the registry to be a NEAT reporter, but loading a model from
+# it must work without neat-python.
+try:
+    from neat.reporting import BaseReporter
+except ImportError:
+    BaseReporter = object
+
+# Keeps the best NNs found while training. The best genome seen so far is
+# tracked in memory and its NN is only written, in the NumPy format of
+# resources.network, when a better one comes along. Every saved NN gets an
+# entry in index.json with its fitness, score, generation, a hash of the
+# config it was trained with and the board and evaluation settings. Fitness
+# is only comparable between models trained on the same board with the same
+# evaluation settings, so "better" is decided among those. Files are written
+# to a temporary name and then renamed, so a crash never leaves a broken
+# model.
+
+INDEX_FILE = "index.json"
+
+
+def board_name(game_config):
+    """
+    This function gives the name a board is recorded under in the index.
+
+    Arguments:
+        game_config {GameConfig} -- The board
+
+    Returns:
+        str -- Its size, e.g. "30x30"
+    """
+    return "{0}x{1}".format(game_config.width, game_config.height)
+
+
+def settings(entry):
+    """
+    This function gives the settings under which the fitness of an index
+    entry was earned. Models saved before boards were recorded were all
+    trained on the default board, and ones saved before evaluation settings
+    were recorded have None for them.
+
+    Arguments:
+        entry {dict} -- An index entry
+
+    Returns:
+        tuple -- The board and the evaluation settings
+    """
+    return (entry.get("board") or board_name(DEFAULT_GAME),
+            entry.get("evaluation"))
+
+
+def config_hash(config):
+    """
+    This function computes a short hash of a NEAT config, so models trained
+    with different settings can be told apart.
+
+    Arguments:
+        config -- The NEAT config
+
+    Returns:
+        str -- The first 12 hex digits of the SHA-256 of the saved config
+    """
+    # neat can only save a config to a file
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        config.save(path)
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    finally:
+        os.remove(path)
+
+
+def _write_atomic(path, data):
+    """
+    This function writes a file by writing a temporary file next to it and
+    renaming it, so the file is either replaced completely or not at all.
+
+    Arguments:
+        path {str} -- The file to write
+        data {bytes} -- The contents of the file
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class ModelRegistry(BaseReporter):
+    """
+    This class stores the NNs of the best genomes found during training in a
+    folder. It is a NEAT reporter so it knows which generation is running.
+    """
+
+    def __init__(self, directory="models"):
+        """
+        This function opens the registry in the given folder, creating the
+        folder if needed.
+
+        Arguments:
+            directory {str} -- The folder the models are kept in
+        """
+        self.directory = directory
+        self.generation = None
+        self._hashes = {}
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.entries = json.load(f)
+        else:
+            self.entries = []
+
+        # The best fitness saved by earlier runs with the same settings has to
+        # be beaten as well
+        self.best_fitness = {key: entry["fitness"] for key, entry
+                             in self.best_per_settings().items()}
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def offer(self, genome, config, score, game_config=None, evaluation=None):
+        """
+        This function saves the NN of a genome if the genome is fitter than
+        every genome saved before with the same board and evaluation settings.
+
+        Arguments:
+            genome -- The genome, with its fitness set
+            config -- The NEAT config it was created with
+            score {int} -- The score the genome reached
+            game_config {GameConfig} -- The board it was trained on, the
+            default one if not given
+            evaluation {str} -- How its fitness was worked out, such as the
+            number of games and how they were combined, if known
+
+        Returns:
+            dict -- The index entry of the saved NN, or None if the genome was
+            not better
+        """
+        board = board_name(game_config or DEFAULT_GAME)
+        key = (board, evaluation)
+        best = self.best_fitness.get(key)
+        if best is not None and genome.fitness <= best:
+            return None
+        self.best_fitness[key] = genome.fitness
+
+        if id(config) not in self._hashes:
+            self._hashes[id(config)] = config_hash(config)
+
+        model_id = max((entry["id"] for entry in self.entries), default=0) + 1
+        entry = {
+            "id": model_id,
+            "file": "model-{0}.npz".format(model_id),
+            "fitness": genome.fitness,
+            "score": score,
+            "generation": self.generation,
+            "genome": genome.key,
+            "config_hash": self._hashes[id(config)],
+            "board": board,
+            "evaluation": evaluation,
+            "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        buffer = io.BytesIO()
+        Network.create(genome, config).save(buffer)
+        _write_atomic(os.path.join(self.directory, entry["file"]),
+                      buffer.getvalue())
+
+        # The index is written last, so it never lists a model that is missing
+        self.entries.append(entry)
+        _write_atomic(os.path.join(self.directory, INDEX_FILE),
+                      json.dumps(self.entries, indent=2).encode())
+        return entry
+
+    def best(self, board=None, evaluation=None):
+        """
+        This function finds the fittest NN trained on a board with the given
+        evaluation settings. Settings that are not given are taken from the
+        NN saved last, as fitness can only be compared within one board and
+        one set of evaluation settings.
+
+        Arguments:
+            board {str} -- The board, e.g. "30x30"
+            evaluation {str} -- The evaluation settings
+
+        Returns:
+            dict -- Its index entry, or None if there is no such NN
+        """
+        entries = self.entries
+        if board is not None:
+            entries = [entry for entry in entries
+                       if settings(entry)[0] == board]
+        if entries and evaluation is None:
+            evaluation = settings(entries[-1])[1]
+        if entries and board is None:
+            board = settings(entries[-1])[0]
+
+        return max((entry for entry in entries
+                    if settings(entry) == (board, evaluation)),
+                   key=lambda entry: entry["fitness"], default=None)
+
+    def best_per_settings(self):
+        """
+        This function finds the fittest NN of every board and set of
+        evaluation settings in the registry.
+
+        Returns:
+            dict -- The index entry of each, keyed by the board and the
+            evaluation settings
+        """
+        best = {}
+        for entry in self.entries:
+            key = settings(entry)
+            if key not in best or entry["fitness"] > best[key]["fitness"]:
+                best[key] = entry
+        return best
+
+    def get(self, model_id):
+        """
+        This function finds the index entry of a NN.
+
+        Arguments:
+            model_id {int} -- The id of the NN
+
+        Returns:
+            dict -- Its index entry
+
+        Raises:
+            KeyError -- If there is no NN with this id
+        """
+        for entry in self.entries:
+            if entry["id"] == model_id:
+                return entry
+        raise KeyError("No model with id {0} in {1}".format(
+            model_id, self.directory))
+
+    def load(self, model_id=None, mmap=False, board=None):
+        """
+        This function loads a NN from the registry.
+
+        Arguments:
+            model_id {int} -- The id of the NN, or None for the fittest one
+            mmap {bool} -- Whether to memory-map the NN's arrays
+            board {str} -- The board the fittest NN must have been trained
+            on, e.g. "30x30", or None for the board of the NN saved last
+
+        Returns:
+            Network -- The neural network
+        """
+        entry = self.best(board) if model_id is None else self.get(model_id)
+        if entry is None:
+            raise KeyError("No models{0} in {1}".format(
+                "" if board is None else " for a " + board + " board",
+                self.directory))
+        return load_network(os.path.join(self.directory, entry["file"]), mmap)
+
+
+def load_network(path, mmap=False):
+    """
+    This function loads a NN saved in the NumPy format, or a pickled
+    FeedForwardNetwork like best_model.pickle, which needs neat-python.
+
+    Arguments:
+        path {str} -- The file to load
+        mmap {bool} -- Whether to memory-map the arrays of a .npz file
+
+    Returns:
+        The neural network
+    """
+    if path.endswith(".npz"):
+        return Network.load(path, mmap)
+
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,293 @@
+import math
+import random
+import numpy as np
+import pygame
+from resources import reference
+
+# Draws the game on the window. Only the blocks that changed since the last
+# frame are drawn again and only their part of the screen is updated, which is
+# a lot cheaper than redrawing the whole window every frame.
+
+BACKGROUND_RGB = (0, 0, 51)
+HEAD_RGB = (255, 255, 255)
+SNAKE_RGB = (0, 255, 0)
+TEXT_RGB = (255, 255, 255)
+
+# The food changes color every this many frames
+ANIMATION_TICKS = 25
+
+# Colors of the board values of the tiled viewer: empty, snake, food and head.
+# Games that have ended are drawn with the darker colors of the second row.
+BOARD_COLORS = np.array([
+    [BACKGROUND_RGB, SNAKE_RGB, (255, 0, 0), HEAD_RGB],
+    [(0, 0, 25), (0, 90, 0), (90, 0, 0), (110, 110, 110)],
+], dtype=np.uint8)
+GAP_RGB = (90, 90, 120)
+
+HEAD = "head"
+BODY = "body"
+FOOD = "food"
+
+
+class Renderer:
+    """
+    This class draws games of snake on a window. It remembers what it drew on
+    every block, so each frame only the blocks around the head, the tail and
+    the food have to be looked at.
+    """
+
+    def __init__(self, window, cell_size=15):
+        """
+        This function creates a renderer. The first frame it draws fills the
+        whole window.
+
+        Arguments:
+            window {Surface} -- The window to draw on
+            cell_size {int} -- The size of a block of the grid in pixels
+        """
+        self.window = window
+        self.cell_size = cell_size
+
+        self.images = {
+            HEAD: pygame.Surface((cell_size, cell_size)),
+            BODY: pygame.Surface((cell_size, cell_size)),
+            FOOD: pygame.Surface((cell_size, cell_size)),
+        }
+        self.images[HEAD].fill(HEAD_RGB)
+        self.images[BODY].fill(SNAKE_RGB)
+        self.food_rgb = (255, 0, 0)
+        self.images[FOOD].fill(self.food_rgb)
+        self.animation_tick = ANIMATION_TICKS
+        # Food colors come from a separate generator, so drawing games does
+        # not change the random numbers used by training.
+        self.rng = random.Random()
+
+        # What is drawn on each block, blocks without an entry are empty
+        self.drawn = {}
+        self.snake = None
+        self.watch = ()
+
+        self.score = None
+        self.score_img = None
+        self.score_rect = None
+
+        self.full_redraw = True
+
+    def snake_ate(self):
+        """
+        This function gives the snake the color of the food it just ate.
+        """
+        self.images[BODY].fill(self.food_rgb)
+        self.full_redraw = True
+
+    def draw(self, snake, food, score):
+        """
+        This function draws a frame and updates the parts of the window that
+        changed.
+
+        Arguments:
+            snake {Snake} -- The snake in the game
+            food {Food} -- The food in the game
+            score {int} -- The current score
+        """
+        # Food color changing is handled here. The food blinks when its color
+        # changes.
+        food_visible = True
+        self.animation_tick -= 1
+        if self.animation_tick == 0:
+            self.food_rgb = (self.rng.randrange(50, 255),
+                             self.rng.randrange(50, 255),
+                             self.rng.randrange(50, 255))
+            self.images[FOOD].fill(self.food_rgb)
+            self.animation_tick = ANIMATION_TICKS
+            food_visible = False
+        food_pos = (food.x, food.y)
+
+        def wanted(cell):
+            if cell == snake.coords[0]:
+                return HEAD
+            if cell in snake.coords:
+                return BODY
+            if cell == food_pos:
+                return FOOD if food_visible else None
+            return None
+
+        if self.full_redraw or snake is not self.snake:
+            self._draw_all(list(snake.coords) + [food_pos], wanted)
+            dirty = [self.window.get_rect()]
+        else:
+            # The snake only changes at its ends: the head moved on by one or
+            # two blocks and the tail moved up or stayed.
+            cells = set(self.watch)
+            cells.update((snake.coords[0], snake.coords[1], snake.coords[-1],
+                          food_pos))
+            dirty = []
+            for cell in cells:
+                state = wanted(cell)
+                if self.drawn.get(cell) != state:
+                    dirty.append(self._draw_cell(cell, state))
+
+        self.snake = snake
+        self.watch = (snake.coords[0], snake.coords[-1], food_pos)
+        self.full_redraw = False
+
+        dirty.extend(self._draw_score(score, dirty))
+        pygame.display.update(dirty)
+
+    def _draw_all(self, cells, wanted):
+        """
+        This function clears the window and draws the given blocks.
+
+        Arguments:
+            cells {list} -- The blocks of the snake and the food
+            wanted -- Function giving what should be drawn on a block
+        """
+        self.window.fill(BACKGROUND_RGB)
+        self.drawn = {}
+        for cell in cells:
+            self._draw_cell(cell, wanted(cell))
+        self.score = None
+
+    def _draw_cell(self, cell, state):
+        """
+        This function draws one block.
+
+        Arguments:
+            cell {tuple} -- The (x, y) position of the block
+            state {str} -- HEAD, BODY, FOOD or None for an empty block
+
+        Returns:
+            Rect -- The part of the window that changed
+        """
+        rect = pygame.Rect(cell[0] * self.cell_size, cell[1] * self.cell_size,
+                           self.cell_size, self.cell_size)
+        if state is None:
+            self.drawn.pop(cell, None)
+            self.window.fill(BACKGROUND_RGB, rect)
+        else:
+            self.drawn[cell] = state
+            self.window.blit(self.images[state], rect)
+        return rect
+
+    def _draw_score(self, score, dirty):
+        """
+        This function draws the score in the top right corner when it changed
+        or when a block under it was drawn over it.
+
+        Arguments:
+            score {int} -- The current score
+            dirty {list} -- The parts of the window drawn this frame
+
+        Returns:
+            list -- The parts of the window that changed
+        """
+        if score == self.score and self.score_rect.collidelist(dirty) == -1:
+            return []
+
+        # The text is blended with what is under it, so the blocks under the
+        # old text are put back before drawing the new one.
+        changed = []
+        if self.score_rect is not None:
+            changed.append(self.score_rect)
+            self._restore(self.score_rect)
+
+        if score != self.score:
+            self.score = score
+            self.score_img = reference.STAT_FONT.render(
+                "Score: " + str(score), 1, TEXT_RGB)
+            width = self.window.get_width()
+            self.score_rect = self.score_img.get_rect(
+                topright=(width - 10, 10))
+            changed.append(self.score_rect)
+
+        self.window.blit(self.score_img, self.score_rect)
+        return changed
+
+    def _restore(self, rect):
+        """
+        This function draws the background and blocks of part of the window.
+
+        Arguments:
+            rect {Rect} -- The part of the window to draw
+        """
+        self.window.fill(BACKGROUND_RGB, rect)
+        size = self.cell_size
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                state = self.drawn.get((x, y))
+                if state is not None:
+                    cell = pygame.Rect(x * size, y * size, size, size)
+                    self.window.blit(self.images[state], cell.clip(rect),
+                                     cell.clip(rect).move(-cell.x, -cell.y))
+
+
+class TiledViewer:
+    """
+    This class shows many games of a BatchGame at once, side by side in one
+    window. Each board is turned into colors with NumPy and drawn with a
+    single blit, no matter how long its snake is.
+    """
+
+    def __init__(self, count, width, height, max_size=900, gap=4):
+        """
+        This function opens a window big enough for the given number of
+        boards.
+
+        Arguments:
+            count {int} -- The number of games to show
+            width {int} -- The width of a board in blocks
+            height {int} -- The height of a board in blocks
+            max_size {int} -- The largest width or height of the window in
+            pixels
+            gap {int} -- The space between two boards in pixels
+        """
+        self.count = count
+        self.columns = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.columns)
+        self.gap = gap
+
+        # Blocks are a whole number of pixels, at most the usual 15
+        self.cell_size = max(1, min(
+            15, (max_size - gap * (self.columns - 1)) // (self.columns * width),
+            (max_size - gap * (self.rows - 1)) // (self.rows * height)))
+        self.tile_width = width * self.cell_size
+        self.tile_height = height * self.cell_size
+
+        self.window = reference.init_display(
+            self.columns * (self.tile_width + gap) - gap,
+            self.rows * (self.tile_height + gap) - gap)
+        self.window.fill(GAP_RGB)
+        self.board = pygame.Surface((width, height))
+        self.tile = pygame.Surface((self.tile_width, self.tile_height))
+
+    def draw(self, game):
+        """
+        This function draws the first games of a BatchGame and updates the
+        window.
+
+        Arguments:
+            game {BatchGame} -- The games to show
+        """
+        count = min(self.count, game.n)
+        boards = game.board[:count].astype(np.intp)
+
+        # Mark the heads that are still on their board
+        games = np.arange(count)
+        x, y = game.head[:count, 0], game.head[:count, 1]
+        inside = ((x >= 0) & (x < boards.shape[2]) &
+                  (y >= 0) & (y < boards.shape[1]))
+        boards[games[inside], y[inside], x[inside]] = 3
+
+        ended = ~game.alive[:count, None, None]
+        colors = BOARD_COLORS[ended.astype(np.intp), boards]
+
+        # surfarray indexes pixels as [x, y]. Each board is copied at one
+        # pixel per block and scaled up to the size of its tile.
+        pixels = colors.transpose(0, 2, 1, 3)
+        for i in range(count):
+            pygame.surfarray.blit_array(self.board, pixels[i])
+            pygame.transform.scale(self.board, self.tile.get_size(), self.tile)
+            row, column = divmod(i, self.columns)
+            self.window.blit(self.tile, (column * (self.tile_width + self.gap),
+                                         row * (self.tile_height + self.gap)))
+        pygame.display.update()
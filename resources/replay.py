@@ -0,0 +1,221 @@
+import random
+import numpy as np
+from resources.util import generate_food, has_failed
+from gamesrc.config import GameConfig, DEFAULT_GAME
+from gamesrc.snake import Snake
+from gamesrc.grid import Grid
+
+# Records games so they can be watched again or inspected move by move. A game
+# only depends on the seed of its food positions and on the actions taken, so
+# a recording is the seed plus one byte per move. Replaying it plays the moves
+# again with the same rules as trainAI.play_genome and testAI.run_model.
+#
+# The food positions also depend on the order in which the grid keeps its free
+# positions, so a recording should be replayed with the version of the game it
+# was made with.
+
+# A copy of the game is kept every this many moves, so any frame can be
+# reached by playing at most this many moves from the copy before it.
+KEYFRAME_EVERY = 200
+
+
+class GameRecorder:
+    """
+    This class collects the actions of a game as it is played.
+    """
+
+    def __init__(self, seed, game_config=DEFAULT_GAME):
+        """
+        This function starts a recording.
+
+        Arguments:
+            seed {int} -- The seed of the food positions of the game
+            game_config {GameConfig} -- The board the game is played on
+        """
+        self.seed = seed
+        self.game_config = game_config
+        self.actions = bytearray()
+
+    def record(self, action):
+        """
+        This function adds a move to the recording.
+
+        Arguments:
+            action {int} -- 0 for left, 1 for right or 2 for forward
+        """
+        self.actions.append(action)
+
+    def save(self, path, score=None, cause=None):
+        """
+        This function saves the recording as a compressed .npz file.
+
+        Arguments:
+            path -- The file name or open binary file to write
+            score {int} -- The final score, stored so a replay can be checked
+            cause {str} -- How the game ended
+        """
+        np.savez_compressed(
+            path, seed=np.uint64(self.seed),
+            actions=np.frombuffer(bytes(self.actions), dtype=np.int8),
+            board=np.array([self.game_config.width, self.game_config.height]),
+            score=np.int64(-1 if score is None else score),
+            cause=np.array("" if cause is None else cause))
+
+
+class GameState:
+    """
+    This class holds everything about a game at one moment of a replay.
+    """
+
+    def __init__(self, seed, game_config=DEFAULT_GAME):
+        """
+        This function sets up the start of a game.
+
+        Arguments:
+            seed {int} -- The seed of the food positions
+            game_config {GameConfig} -- The board the game is played on
+        """
+        self.game_config = game_config
+        self.rng = random.Random(seed)
+        self.grid = Grid(game_config)
+        self.snake = Snake(self.grid)
+        self.food = generate_food(self.grid, self.snake, self.rng)
+        self.score = 0
+        self.step = 0
+        self.failure = None
+
+    def copy(self):
+        """
+        This function makes an independent copy of the game.
+
+        Returns:
+            GameState -- The copy
+        """
+        state = GameState.__new__(GameState)
+        state.game_config = self.game_config
+        state.rng = random.Random()
+        state.rng.setstate(self.rng.getstate())
+        state.grid = self.grid.copy()
+        state.snake = Snake(None, self.snake.coords, self.snake.orientation)
+        # Food never changes once placed, so it can be shared
+        state.food = self.food
+        state.score = self.score
+        state.step = self.step
+        state.failure = self.failure
+        return state
+
+    def advance(self, action):
+        """
+        This function plays one move.
+
+        Arguments:
+            action {int} -- 0 for left, 1 for right or 2 for forward
+
+        Returns:
+            bool -- Whether the snake ate the food
+        """
+        self.snake.move(self.grid, action)
+        self.step += 1
+
+        ate = self.snake.collide(self.food)
+        if ate:
+            self.score += 1
+            self.snake.elongate(self.grid)
+            self.food = generate_food(self.grid, self.snake, self.rng)
+
+        self.failure = has_failed(self.snake, self.game_config)
+        return ate
+
+
+class Replay:
+    """
+    This class plays a recorded game again. Frame 0 is the start of the game
+    and frame i is the game after i moves.
+    """
+
+    def __init__(self, seed, actions, game_config=DEFAULT_GAME, score=None,
+                 cause=None):
+        """
+        This function prepares a replay.
+
+        Arguments:
+            seed {int} -- The seed of the food positions
+            actions -- The actions of the game, one byte per move
+            game_config {GameConfig} -- The board the game was played on
+            score {int} -- The recorded final score, if known
+            cause {str} -- How the recorded game ended, if known
+        """
+        self.seed = seed
+        self.actions = bytes(actions)
+        self.game_config = game_config
+        self.score = score
+        self.cause = cause
+
+        # Copies of the game at every KEYFRAME_EVERY moves, made the first
+        # time the replay gets that far
+        self.keyframes = [GameState(seed, game_config)]
+
+    def __len__(self):
+        return len(self.actions) + 1
+
+    @staticmethod
+    def load(path):
+        """
+        This function loads a recording saved by GameRecorder.
+
+        Arguments:
+            path {str} -- The file to read
+
+        Returns:
+            Replay -- The replay of the recorded game
+        """
+        with np.load(path) as data:
+            width, height = (int(size) for size in data["board"])
+            score = int(data["score"])
+            return Replay(int(data["seed"]), data["actions"],
+                          GameConfig(width, height),
+                          None if score < 0 else score,
+                          str(data["cause"]) or None)
+
+    def frame(self, index):
+        """
+        This function reconstructs the game at a frame, starting from the
+        keyframe before it.
+
+        Arguments:
+            index {int} -- The frame, negative to count from the end
+
+        Returns:
+            GameState -- The game at that frame, which the caller may change
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Frame {0} is not in a replay of {1} frames"
+                             .format(index, len(self)))
+
+        keyframe = min(index // KEYFRAME_EVERY, len(self.keyframes) - 1)
+        state = self.keyframes[keyframe].copy()
+        while state.step < index:
+            state.advance(self.actions[state.step])
+            if (state.step % KEYFRAME_EVERY == 0 and
+                    state.step // KEYFRAME_EVERY == len(self.keyframes)):
+                self.keyframes.append(state.copy())
+        return state
+
+    def frames(self, start=0):
+        """
+        This function plays the replay from a frame to the end.
+
+        Arguments:
+            start {int} -- The first frame
+
+        Yields:
+            tuple -- The game, which is changed in place from one frame to
+            the next, and whether the snake ate on the move into the frame
+        """
+        state = self.frame(start)
+        yield state, False
+        while state.step < len(self.actions):
+            ate = state.advance(self.actions[state.step])
+            yield state, ate
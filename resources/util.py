@@ -1,10 +1,17 @@
-import pygame
 import random
-from resources.reference import *
 from gamesrc.food import Food
+from gamesrc.config import DEFAULT_GAME
+from gamesrc.observation import observe, get_food_hints
 
 # Some common methods used throughout the project.
 
+# A snake that makes this many moves without eating, plus a few more for every
+# part of its body, is almost certainly looping and is stopped. On boards so
+# big that the food can be further away, the width plus the height is used
+# instead of STARVE_STEPS.
+STARVE_STEPS = 100
+STARVE_STEPS_PER_PART = 10
+
 
 def make_food_decision(snake, food):
     """
@@ -21,55 +28,9 @@ def make_food_decision(snake, food):
         yes or no for each decision.
     """
 
-    # Find relative distance
     dist_x = food.x - snake.coords[0][0]
     dist_y = food.y - snake.coords[0][1]
-
-    go_front, go_left, go_right = 0, 0, 0
-
-    # Based on distance and orientation make a choice
-    if snake.orientation == "U":
-        if dist_x == 0:
-            if dist_y <= 0:
-                go_front = 1
-            else:
-                go_right = 1
-        elif dist_x < 0:
-            go_left = 1
-        elif dist_x > 0:
-            go_right = 1
-    elif snake.orientation == "D":
-        if dist_x == 0:
-            if dist_y <= 0:
-                go_right = 1
-            else:
-                go_front = 1
-        elif dist_x < 0:
-            go_right = 1
-        elif dist_x > 0:
-            go_left = 1
-    elif snake.orientation == "L":
-        if dist_y == 0:
-            if dist_x <= 0:
-                go_front = 1
-            else:
-                go_right = 1
-        elif dist_y < 0:
-            go_right = 1
-        elif dist_y > 0:
-            go_left = 1
-    else:
-        if dist_y == 0:
-            if dist_y <= 0:
-                go_right = 1
-            else:
-                go_front = 1
-        elif dist_y < 0:
-            go_left = 1
-        elif dist_y > 0:
-            go_right = 1
-
-    return go_front, go_left, go_right
+    return get_food_hints(snake.orientation, dist_x, dist_y)
 
 
 def make_decision(network, grid, snake, food):
@@ -87,32 +48,82 @@ def make_decision(network, grid, snake, food):
         list -- the decision list from activatation.
     """
 
-    adjacent = snake.get_8_adjacent(grid)
-
-    go_front, go_left, go_right = make_food_decision(snake, food)
-
     # Make a decision based on the 8 adjacent squares and food's relative
     # position
-    inputs = tuple(adjacent + [go_front, go_left, go_right])
+    inputs = observe(grid, snake, food)
 
     decision = network.activate(inputs)
     return decision
 
 
-def generate_food(grid, snake):
+def has_failed(snake, game_config=DEFAULT_GAME):
+    """
+    This function checks to see if the snake has met any of the fail conditions.
+    Only the size of the grid is needed to check extremes, not the grid object.
+
+    Arguments:
+        snake {Snake} -- The snake whose status is to be found.
+        game_config {GameConfig} -- The size of the grid
+
+    Returns:
+        str -- "self" if it hit its own body, "wall" if it went outside the
+        grid and None if it has not failed.
+    """
+    x, y = snake.coords[0][0], snake.coords[0][1]
+
+    # Did it go outside the grid?
+    if x < 0 or x >= game_config.width or y < 0 or y >= game_config.height:
+        return "wall"
+    elif snake.hit_itself():  # Did it hit its own body?
+        return "self"
+    else:
+        return None
+
+
+def starve_limit(length, game_config=DEFAULT_GAME):
+    """
+    This function gives the number of moves a snake may make without eating
+    before it is stopped.
+
+    Arguments:
+        length -- The length of the snake, or an array of lengths
+        game_config {GameConfig} -- The size of the grid
+
+    Returns:
+        The number of moves for each length
+    """
+    base = max(STARVE_STEPS, game_config.width + game_config.height)
+    return base + STARVE_STEPS_PER_PART * length
+
+
+def generate_food(grid, snake, rng=random):
     """
     This function generates a Food object ata  random position on the grid such
-    that is is not on the snake.
+    that is is not on the snake. The grid keeps track of the free positions, so
+    this takes the same time no matter how long the snake is.
 
     Arguments:
         grid {Grid} -- The grid where the food must be spawned
         snake {Snake} -- The snake on the grid.
+        rng {Random} -- The random number generator to use. Pass a seeded
+        random.Random to make the food positions reproducible.
 
     Returns:
-        Food -- The new food object
+        Food -- The new food object. If there is no free position left it is
+        placed at (-1, -1), outside the grid where it can never be eaten, like
+        BatchGame does.
     """
-    while True:
-        # Don't want it to be too close to the edge for visual reasons.
-        x, y = random.randrange(2, 28), random.randrange(2, 28)
-        if (x, y) not in snake.coords:
-            return Food(grid, x, y)
+    # Don't want it to be too close to the edge for visual reasons, so the
+    # grid only tracks free positions away from the edges.
+    free = grid.free
+    pos = free[rng.randrange(len(free))] if free else None
+
+    # A snake that was not created with this grid is not marked on it, so its
+    # positions have to be left out here
+    if pos in snake.cells:
+        free = [pos for pos in free if pos not in snake.cells]
+        pos = free[rng.randrange(len(free))] if free else None
+
+    if pos is None:
+        return Food(grid, -1, -1)
+    return Food(grid, pos[0], pos[1])
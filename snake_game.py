@@ -1,121 +1,61 @@
+import sys
+import argparse
 import pygame
-import random
-import neat
-import os
+from resources import reference
 from resources.reference import *
 from resources.util import *
+from resources.render import Renderer
 from gamesrc.grid import Grid
 from gamesrc.snake import Snake
-from gamesrc.food import Food
+from gamesrc.moves import FORWARD, TURN_LEFT, TURN_RIGHT
+from gamesrc.config import GameConfig, DEFAULT_GAME
 
 
-def has_failed(snake):
+def parse_args(argv):
     """
-    This function checks to see if the snake has met any of the fail conditions.
-    Since the grid is a standard 30 by 30 grid, the grid object is not required
-    to check extremes.
+    This function reads the options from the command line.
 
     Arguments:
-        snake {Snake} -- The snake whose status is to be found.
+        argv {list} -- The command line arguments, without the program name
 
     Returns:
-        boolean -- true if it has met a fail condition and False otherwise.
+        Namespace -- The parsed options
     """
-    x, y = snake.coords[0][0], snake.coords[0][1]
-
-    # Did it hit its own body?
-    if ((x, y) in snake.coords[1:]):
-        return True
-    elif x < 0 or x > 29 or y < 0 or y > 29:  # Did it go outside the grid?
-        return True
-    else:
-        return False
-
-
-def draw(window, snake, food, score):
-    """
-    This function draws and updates the pygame window with the given information.
-
-    Arguments:
-        window {Surface} -- The active PyGame window
-        snake {Snake} -- The snake in the game
-        food {Food} -- The food in the game
-        score {int} -- The current score
-    """
-
-    global ANIMATION_TICK
-    ANIMATION_TICK -= 1  # Used to change food color
-
-    window.fill((0, 0, 51))
-
-    # Food color changing and drawing is handled here
-    if ANIMATION_TICK == 0:
-        global FOOD_RGB
-        FOOD_RGB = (
-            random.randrange(
-                50, 255), random.randrange(
-                50, 255), random.randrange(
-                50, 255))
-        FOOD_IMG.fill(FOOD_RGB)
-        ANIMATION_TICK = 25
-    else:
-        window.blit(FOOD_IMG, (food.x * 15, food.y * 15))
-
-    # Draw snake
-    for i, coord in enumerate(snake.coords):
-        x = coord[0] * 15
-        y = coord[1] * 15
-
-        if i == 0:
-            head = pygame.Surface((15, 15))
-            head.fill((255, 255, 255))
-            WINDOW.blit(head, (x, y))
-        else:
-            WINDOW.blit(SNAKE_IMG, (x, y))
-
-    # Draw Score
-    score_txt = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
-    window.blit(
-        score_txt,
-        (WIN_WIDTH - 10 - score_txt.get_width(), 10))  # top right of screen
-
-    pygame.display.update()
+    parser = argparse.ArgumentParser(description="Play snake yourself.")
+    parser.add_argument(
+        "--board", type=GameConfig.parse, metavar="WxH", default=DEFAULT_GAME,
+        help="size of the board in blocks, e.g. 64x64 (default: 30x30)")
+    return parser.parse_args(argv)
 
 
 def main():
     """This function runs the game for humans.
     """
+    game_config = parse_args(sys.argv[1:]).board
 
-    global FOOD_RGB  # Food needs RGB too
-    grid = Grid()
-    snake = Snake()
+    grid = Grid(game_config)
+    snake = Snake(grid)
     food = generate_food(grid, snake)
     score = 0
 
+    renderer = Renderer(init_display(*game_config.window_size),
+                        game_config.cell_size)
+
     isRunning = True
     while isRunning:
-        game_clock.tick(17)
-
-        move = None
-        for event in pygame.event.get():
-            # Handle Quittiing
-            if event.type == pygame.QUIT:
-                isRunning = False
-                pygame.quit()
-                quit()
-
-            # Check for key presses
-            elif event.type == pygame.KEYDOWN:
+        reference.game_clock.tick(17)
+
+        move = FORWARD
+        # Closing the window is handled for us, check for key presses
+        for event in handle_events():
+            if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_LEFT:
-                    move = "L"
+                    move = TURN_LEFT
                 elif event.key == pygame.K_RIGHT:
-                    move = "R"
+                    move = TURN_RIGHT
 
         # Moves ahead if you didn't choose a move
-        if move is None:
-            snake.tick(grid)
-        else:
-            snake.move(grid, move)
+        snake.move(grid, move)
 
         # Check if snake collided with the food
         if snake.collide(food):
@@ -123,16 +63,16 @@ def main():
             snake.elongate(grid)
 
             # Fancy color changing for snake :)
-            SNAKE_IMG.fill(FOOD_RGB)
+            renderer.snake_ate()
 
             food = generate_food(grid, snake)
 
         # Stop running in case
-        if has_failed(snake):
+        if has_failed(snake, game_config):
             isRunning = False
             break
 
-        draw(WINDOW, snake, food, score)
+        renderer.draw(snake, food, score)
 
 
 if __name__ == "__main__":
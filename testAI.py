@@ -1,157 +1,437 @@
-import pygame
 import numpy
 import random
-import neat
-import os
-import pickle
+import sys
+import argparse
+import time
+import multiprocessing
+from resources import reference
 from resources.reference import *
 from resources.util import *
+from resources.registry import (ModelRegistry, load_network, board_name,
+                                settings)
+from resources.network import Network
+from resources.replay import GameRecorder, Replay
+from gamesrc.config import GameConfig, DEFAULT_GAME
 from gamesrc.grid import Grid
 from gamesrc.snake import Snake
-from gamesrc.food import Food
+from gamesrc.batch import BatchGame, DEATH_CAUSES
+from gamesrc.observation import observe_batch
+from gamesrc.loops import BatchLoopDetector
 
+# Games are evaluated in chunks of this many, played together with NumPy.
+# Small chunks waste less time on games that have already ended.
+EVAL_CHUNK = 250
 
-def has_failed(snake):
+
+def run_model(nn, game_config=DEFAULT_GAME, seed=None, record=None):
     """
-    This function checks to see if the snake has met any of the fail conditions.
-    Since the grid is a standard 30 by 30 grid, the grid object is not required
-    to check extremes.
+    This function plays the game of snake using the decisions made by the nn
+    passed to it.
 
     Arguments:
-        snake {Snake} -- The snake whose status is to be found.
+        nn  -- The neural network
+        game_config {GameConfig} -- The board to play on
+        seed {int} -- Seed for the food positions, random if not given
+        record {str} -- File to save a recording of the game in, if any
+    """
+    # The seed is always known, so the game can be recorded
+    if seed is None:
+        seed = random.getrandbits(32)
+    recorder = GameRecorder(seed, game_config)
+
+    rng = random.Random(seed)
+    grid = Grid(game_config)
+    snake = Snake(grid)
+    food = generate_food(grid, snake, rng)
+    score = 0
 
-    Returns:
-        boolean -- true if it has met a fail condition and False otherwise.
+    # Only imported when drawing, so --list and --export never load pygame
+    from resources.render import Renderer
+    renderer = Renderer(init_display(*game_config.window_size),
+                        game_config.cell_size)
+
+    isRunning = True
+    while isRunning:
+        reference.game_clock.tick(17)
+
+        # Check for quitting
+        handle_events()
+
+        # Make a decision at every tick or move forward by default
+        decision = make_decision(nn, grid, snake, food)
+        action = decision.index(max(decision))
+        snake.move(grid, action)
+        recorder.record(action)
+
+        # Check if snake collided with food as a result
+        if snake.collide(food):
+            score += 1
+            snake.elongate(grid)
+
+            # Fancy color changing for snake :)
+            renderer.snake_ate()
+
+            food = generate_food(grid, snake, rng)
+
+        # If it fails, then stop
+        failure = has_failed(snake, game_config)
+        if failure is not None:
+            isRunning = False
+            break
+
+        renderer.draw(snake, food, score)
+
+    if record is not None:
+        recorder.save(record, score, failure)
+        print("Recorded {0} moves with seed {1} in {2}".format(
+            len(recorder.actions), seed, record))
+
+
+def watch_replay(replay, start=0, fps=17):
     """
-    x, y = snake.coords[0][0], snake.coords[0][1]
+    This function draws a recorded game from the given frame to the end.
 
-    # Did it hit its own body?
-    if ((x, y) in snake.coords[1:]):
-        return True
-    elif x < 0 or x > 29 or y < 0 or y > 29:  # Did it go outside the grid?
-        return True
-    else:
-        return False
+    Arguments:
+        replay {Replay} -- The recorded game
+        start {int} -- The frame to start from
+        fps {int} -- Moves shown per second
+    """
+    from resources.render import Renderer
+    game_config = replay.game_config
+    renderer = Renderer(init_display(*game_config.window_size),
+                        game_config.cell_size)
+
+    for state, ate in replay.frames(start):
+        reference.game_clock.tick(fps)
+        handle_events()
+        if ate:
+            renderer.snake_ate()
+        if state.failure is not None:
+            break
+        renderer.draw(state.snake, state.food, state.score)
 
 
-def draw(window, snake, food, score):
+def describe_replay(replay, frame=-1):
     """
-    This function draws and updates the pygame window with the given information.
+    This function prints the state of a recorded game at a frame, without
+    drawing anything.
 
     Arguments:
-        window {Surface} -- The active PyGame window
-        snake {Snake} -- The snake in the game
-        food {Food} -- The food in the game
-        score {int} -- The current score
-    """
-
-    global ANIMATION_TICK
-    ANIMATION_TICK -= 1  # Used to change food color
-
-    window.fill((0, 0, 51))
-
-    # Food color changing and drawing is handled here
-    if ANIMATION_TICK == 0:
-        global FOOD_RGB
-        FOOD_RGB = (
-            random.randrange(
-                50, 255), random.randrange(
-                50, 255), random.randrange(
-                50, 255))
-        FOOD_IMG.fill(FOOD_RGB)
-        ANIMATION_TICK = 25
-    else:
-        window.blit(FOOD_IMG, (food.x * 15, food.y * 15))
+        replay {Replay} -- The recorded game
+        frame {int} -- The frame to show, the last one by default
+    """
+    state = replay.frame(frame)
+    print("Replay of {0} moves on a {1}x{2} board, seed {3}".format(
+        len(replay.actions), replay.game_config.width,
+        replay.game_config.height, replay.seed))
+    if replay.score is not None:
+        print("Recorded: score {0}, ended by {1}".format(
+            replay.score, replay.cause))
+    print("Frame {0}: score {1}, length {2}, head {3} facing {4}, food at "
+          "({5}, {6}){7}".format(
+              state.step, state.score, len(state.snake.coords),
+              state.snake.coords[0], state.snake.orientation_name,
+              state.food.x, state.food.y,
+              ", ended by " + state.failure if state.failure else ""))
+
+
+def play_model_games(network, seeds, game_config=DEFAULT_GAME):
+    """
+    This function plays one game per seed with a NN, all at once with a
+    BatchGame and without drawing. A game ends when the snake dies or when it
+    goes too long without eating, as in training, but there is no score at
+    which it is stopped. A snake found going around in a loop would starve,
+    so its game is stopped right away and counted as if it had.
 
-    # Draw snake
-    for i, coord in enumerate(snake.coords):
-        x = coord[0] * 15
-        y = coord[1] * 15
+    Arguments:
+        network {Network} -- The neural network
+        seeds {array} -- The seeds of the food positions, one per game
+        game_config {GameConfig} -- The board to play on
+
+    Returns:
+        tuple of ndarray -- The final score, the number of moves and how
+        each game ended: "wall", "self", "starved" or "loop"
+    """
+    n = len(seeds)
+    game = BatchGame(n, seeds, game_config)
+    loops = BatchLoopDetector(game, track=False, most_moves=starve_limit(
+        game.capacity, game_config))
+    causes = numpy.full(n, None, dtype=object)
+    steps_since_food = numpy.zeros(n, dtype=numpy.int64)
+    moves = numpy.zeros(n, dtype=numpy.int64)
+
+    while game.alive.any():
+        # The single network plays every game as one batch of inputs
+        inputs = observe_batch(game)[None]
+        actions = network.batch.activate(inputs)[0].argmax(axis=1)
+
+        running = game.alive.copy()
+        ate, died = game.step(actions)
+        steps_since_food[running] += 1
+        steps_since_food[ate] = 0
+        causes[died] = [DEATH_CAUSES[d] for d in game.death[died]]
+
+        starved = game.alive & (steps_since_food >=
+                                starve_limit(game.length, game_config))
+        causes[starved] = "starved"
+        game.alive &= ~starved
+
+        # The moves a looping snake has left until it starves still count
+        looping = loops.update(game.alive, ate)
+        limit = starve_limit(game.length[looping], game_config)
+        moves[looping] = limit - steps_since_food[looping]
+        causes[looping] = "loop"
+        game.alive &= ~looping
+
+    return game.score.copy(), game.steps + moves, causes
 
-        if i == 0:
-            head = pygame.Surface((15, 15))
-            head.fill((255, 255, 255))
-            WINDOW.blit(head, (x, y))
-        else:
-            WINDOW.blit(SNAKE_IMG, (x, y))
 
-    # Draw Score
-    score_txt = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
-    window.blit(
-        score_txt,
-        (WIN_WIDTH - 10 - score_txt.get_width(), 10))  # top right of screen
+# NN and board shared by every chunk a worker process plays. They are sent
+# once when the worker starts instead of with every chunk.
+_WORKER_GAME = None
 
-    pygame.display.update()
 
+def _init_worker(network, game_config):
+    global _WORKER_GAME
+    _WORKER_GAME = (network, game_config)
 
-def run_model(nn):
+
+def _play_in_worker(seeds):
+    return play_model_games(_WORKER_GAME[0], seeds, _WORKER_GAME[1])
+
+
+def evaluate_model(neural_net, games, game_config=DEFAULT_GAME, seed=None,
+                   workers=1):
     """
-    This function plays the game of snake using the decisions made by the nn
-    passed to it.
+    This function plays many games with a NN without drawing them, spread
+    over several processes, and prints how well it did.
 
     Arguments:
-        nn  -- The neural network
+        neural_net -- The NN, either a Network or a FeedForwardNetwork
+        games {int} -- The number of games to play
+        game_config {GameConfig} -- The board to play on
+        seed {int} -- Seed for the seeds of the games, random if not given.
+        BatchGame spawns food with its own generator, so these games are not
+        the ones run_model plays with the same seed.
+        workers {int} -- The number of processes to play in
+
+    Returns:
+        tuple of ndarray -- The final score, the number of moves and the end
+        cause of every game
     """
+    if not isinstance(neural_net, Network):
+        neural_net = Network.from_feed_forward(neural_net)
+
+    seeds = numpy.random.default_rng(seed).integers(
+        0, 2 ** 63, size=games, dtype=numpy.uint64)
+    chunks = [seeds[i:i + EVAL_CHUNK] for i in range(0, games, EVAL_CHUNK)]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.Pool(workers, _init_worker,
+                                  (neural_net, game_config)) as pool:
+            parts = pool.map(_play_in_worker, chunks, chunksize=1)
+    else:
+        parts = [play_model_games(neural_net, chunk, game_config)
+                 for chunk in chunks]
+    seconds = time.perf_counter() - start
 
-    global FOOD_RGB
+    score, steps, causes = (numpy.concatenate(arrays) for arrays in zip(*parts))
+    report_evaluation(score, steps, causes, seconds)
+    return score, steps, causes
 
-    grid = Grid()
-    snake = Snake()
-    food = generate_food(grid, snake)
-    score = 0
 
-    isRunning = True
-    while isRunning:
-        game_clock.tick(17)
+def report_evaluation(score, steps, causes, seconds):
+    """
+    This function prints the distribution of the scores and game lengths of
+    an evaluation and how its games ended.
 
-        # Check for quitting
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                isRunning = False
-                pygame.quit()
-                quit()
+    Arguments:
+        score {ndarray} -- The final score of every game
+        steps {ndarray} -- The number of moves of every game
+        causes {ndarray} -- How every game ended
+        seconds {float} -- How long the games took to play
+    """
+    print("Played {0:,} games in {1:.1f} s ({2:,.0f} games/s, {3:,.0f} "
+          "moves/s)".format(len(score), seconds, len(score) / seconds,
+                            steps.sum() / seconds))
+
+    percentiles = (5, 25, 50, 75, 95)
+    for name, values in (("score", score), ("moves", steps)):
+        print("{0:<6} mean {1:8.1f}  std {2:8.1f}  min {3:6}  {4}  max {5:6}"
+              .format(name, values.mean(), values.std(), values.min(),
+                      "  ".join("p{0} {1:6.0f}".format(p, v) for p, v in zip(
+                          percentiles, numpy.percentile(values, percentiles))),
+                      values.max()))
+
+    ended = {cause: numpy.count_nonzero(causes == cause)
+             for cause in ("wall", "self", "starved", "loop")}
+    print("ended  " + "  ".join("{0} {1:.1%}".format(cause, count / len(causes))
+                                for cause, count in ended.items()))
+
+
+def load_model(models_dir, model_id=None, path=None,
+               game_config=DEFAULT_GAME):
+    """
+    This function loads a NN saved by training. The fittest NN trained on the
+    board in the registry is used unless another one is chosen. Without a
+    registry it falls back to best_model.pickle.
 
-        # Make a decision at every tick or move forward by default
-        decision = make_decision(nn, grid, snake, food)
-        max_val = max(decision)
+    Arguments:
+        models_dir {str} -- The folder of the model registry
+        model_id {int} -- The id of the NN to load, or None for the fittest
+        path {str} -- A .npz or pickled NN to load instead of the registry
+        game_config {GameConfig} -- The board the NN is going to play on
 
-        if max_val == decision[0]:
-            snake.move(grid, "L")
-        elif max_val == decision[1]:
-            snake.move(grid, "R")
-        else:
-            snake.tick(grid)
+    Returns:
+        The neural network
+    """
+    if path is not None:
+        return load_network(path, mmap=True)
 
-        # Check if snake collided with food as a result
-        if snake.collide(food):
-            score += 1
-            snake.elongate(grid)
+    registry = ModelRegistry(models_dir)
+    if registry.entries or model_id is not None:
+        return registry.load(model_id, mmap=True,
+                             board=board_name(game_config))
 
-            # Fancy color changing for snake :)
-            SNAKE_IMG.fill(FOOD_RGB)
+    return load_network("best_model.pickle")
 
-            food = generate_food(grid, snake)
 
-        # If it fails, then stop
-        if has_failed(snake):
-            isRunning = False
-            break
+def export_model(neural_net, path):
+    """
+    This function saves a NN in the NumPy format, which loads without
+    neat-python.
+
+    Arguments:
+        neural_net -- The NN, either a Network or a FeedForwardNetwork
+        path {str} -- The .npz file to write
+    """
+    if not isinstance(neural_net, Network):
+        neural_net = Network.from_feed_forward(neural_net)
+    neural_net.save(path)
+
 
-        draw(WINDOW, snake, food, score)
+def list_models(models_dir):
+    """
+    This function prints the NNs saved in the model registry.
+
+    Arguments:
+        models_dir {str} -- The folder of the model registry
+    """
+    registry = ModelRegistry(models_dir)
+    # Fitness can only be compared between NNs trained on the same board
+    # with the same evaluation settings, so each of those has its own best
+    best = list(registry.best_per_settings().values())
+    print("{0:>4} {1:>10} {2:>6} {3:>11} {4:>13} {5:>9}  {6:<24} {7}".format(
+        "id", "fitness", "score", "generation", "config", "board",
+        "evaluation", "saved"))
+    for entry in registry.entries:
+        board, evaluation = settings(entry)
+        print("{0:>4} {1:>10.1f} {2:>6} {3:>11} {4:>13} {5:>9}  {6:<24} "
+              "{7}{8}".format(
+                  entry["id"], entry["fitness"], entry["score"],
+                  entry["generation"], entry["config_hash"], board,
+                  evaluation or "-", entry["saved"],
+                  "  (best)" if any(entry is b for b in best) else ""))
+
+
+def parse_args(argv):
+    """
+    This function reads the options from the command line.
+
+    Arguments:
+        argv {list} -- The command line arguments, without the program name
+
+    Returns:
+        Namespace -- The parsed options
+    """
+    parser = argparse.ArgumentParser(description="Watch a trained snake AI play.")
+    parser.add_argument(
+        "--model", type=int, metavar="ID",
+        help="id of the NN to load from the registry, by default the fittest "
+        "one trained on --board")
+    parser.add_argument(
+        "--list", action="store_true",
+        help="list the NNs in the registry and exit")
+    parser.add_argument(
+        "--models-dir", metavar="PATH", default="models",
+        help="folder of the model registry (default: models)")
+    parser.add_argument(
+        "--file", metavar="PATH",
+        help="play a NN saved as .npz or pickle instead of the registry")
+    parser.add_argument(
+        "--export", metavar="PATH",
+        help="save the chosen NN as .npz and exit")
+    parser.add_argument(
+        "--board", type=GameConfig.parse, metavar="WxH", default=DEFAULT_GAME,
+        help="size of the board in blocks, e.g. 64x64 (default: 30x30)")
+    parser.add_argument(
+        "--seed", type=int, metavar="N",
+        help="seed for the food positions, random by default")
+    parser.add_argument(
+        "--record", metavar="PATH",
+        help="save a recording of the game in PATH")
+    parser.add_argument(
+        "--replay", metavar="PATH",
+        help="watch a recorded game instead of playing one")
+    parser.add_argument(
+        "--frame", type=int, metavar="N", default=None,
+        help="frame of the replay to start from; with --headless the frame "
+        "to print, the last one by default")
+    parser.add_argument(
+        "--fps", type=int, default=17,
+        help="moves per second when watching a replay (default: 17)")
+    parser.add_argument(
+        "--evaluate", type=int, metavar="N",
+        help="play N games without drawing them and print the distribution "
+        "of scores, game lengths and deaths; --seed makes it repeatable. "
+        "These games spawn food differently from drawn or recorded games, so "
+        "the same --seed gives other games in the two modes")
+    parser.add_argument(
+        "--workers", type=int, metavar="N", default=0,
+        help="processes to play --evaluate games in, 0 for one per CPU core "
+        "(default: 0)")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="print the replayed frame instead of drawing the replay")
+    return parser.parse_args(argv)
 
 
 def main():
     """
     This function is called to run the program with the stored neural net.
     """
+    args = parse_args(sys.argv[1:])
+    if args.replay:
+        replay = Replay.load(args.replay)
+        if HEADLESS:
+            describe_replay(replay, -1 if args.frame is None else args.frame)
+        else:
+            watch_replay(replay, args.frame or 0, args.fps)
+        return
+
+    if args.list:
+        list_models(args.models_dir)
+        return
 
     # Load stored NN
-    nn_file = open("best_model.pickle", "rb")
-    neural_net = pickle.load(nn_file)
-    nn_file.close()
+    try:
+        neural_net = load_model(args.models_dir, args.model, args.file,
+                                args.board)
+    except KeyError as error:
+        sys.exit(error.args[0])
+    if args.export:
+        export_model(neural_net, args.export)
+        return
+
+    if args.evaluate:
+        workers = args.workers or multiprocessing.cpu_count()
+        evaluate_model(neural_net, args.evaluate, args.board, args.seed,
+                       min(workers, -(-args.evaluate // EVAL_CHUNK)))
+        return
 
     # Use NN to run Flappy Bird
-    run_model(neural_net)
+    run_model(neural_net, args.board, args.seed, args.record)
 
 
 if __name__ == "__main__":
@@ -1,220 +1,839 @@
-import pygame
-import numpy
+import numpy as np
 import random
 import neat
 import os
-import pickle
+import sys
+import argparse
+import multiprocessing
+from collections import Counter
+from resources import reference
 from resources.reference import *
 from resources.util import *
+from resources.profiling import Profiler, NullProfiler, ProfileReporter
+from resources.checkpoint import (AsyncCheckpointer, latest_checkpoint,
+                                  restore_checkpoint)
+from resources.registry import ModelRegistry
+from resources.replay import GameRecorder
+from resources.fitness_cache import FitnessCache
+from resources.network import BatchNetwork
+from gamesrc.observation import observe, observe_batch
 from gamesrc.grid import Grid
 from gamesrc.snake import Snake
-from gamesrc.food import Food
+from gamesrc.batch import BatchGame, DEATH_CAUSES
+from gamesrc.moves import FORWARD
+from gamesrc.config import GameConfig, DEFAULT_GAME
+from gamesrc.loops import LoopDetector, BatchLoopDetector
 
+# The board games are played on, set from the command line in main()
+GAME_CONFIG = DEFAULT_GAME
 
-def has_failed(snake, genome):
+# Number of generations in a training run, including any resumed ones
+GENERATIONS = 50
+
+# Times the phases of every move when profiling is turned on in main()
+PROFILER = NullProfiler()
+
+# Fitness lost for each way of failing. Hitting itself costs a lot of points
+# and hitting the wall slightly less because inputs used for the NN generally
+# mean this case is already rare.
+FAIL_PENALTY = {"self": 3, "wall": 2.5}
+
+# A score of 45 generally means it has gotten as good as it could have, so
+# there is no point in playing on
+SOLVED_SCORE = 45
+
+# Games of snakes found going around in a loop are stopped right away instead
+# of when the snake starves. They get the fitness they would have had by then,
+# so this only saves time.
+DETECT_LOOPS = True
+
+def play_genome(genome, config, render, seed=None, recorder=None):
     """
-    This function checks to see if the snake has met any of the fail conditions.
-    Since the grid is a standard 30 by 30 grid, the grid object is not required
-    to check extremes.
+    This function plays one game of snake with the NN formed from the given
+    genome and works out the genome's fitness based on how well it played. The
+    genome itself is left untouched.
 
     Arguments:
-        snake {Snake} -- The snake whose status is to be found.
-        genome -- The genome controlling this snake
+        genome -- The genome to evaluate
+        config -- The NEAT config used to build the NN
+        render {bool} -- Whether the game should be drawn on the window
+        seed {int} -- Seed for the food positions, random if not given
+        recorder {GameRecorder} -- Records the moves of the game when given
 
     Returns:
-        boolean -- true if it has met a fail condition and False otherwise.
-    """
-    x, y = snake.coords[0][0], snake.coords[0][1]
-    if ((x, y) in snake.coords[1:]):
-        genome.fitness -= 3  # Loses a lot of points for hitting itself
-        return True
-    elif x < 0 or x > 29 or y < 0 or y > 29:
-        # Loses slightly less pints for hitting the wall because inputs used for
-        # the NN generally mean this case is already rare.
-
-        genome.fitness -= 2.5
-        return True
-    else:
-        return False
+        tuple -- The fitness earned, the final score, the number of moves and
+        how the game ended: "wall", "self", "starved", "loop" or "solved"
+    """
 
+    profiler = PROFILER
+    profiler.start()
+
+    network = neat.nn.FeedForwardNetwork.create(genome, config)
+    fitness = 0
+
+    if render:
+        # Only imported when drawing, so training never loads pygame
+        from resources.render import Renderer
+        renderer = Renderer(init_display(*GAME_CONFIG.window_size),
+                            GAME_CONFIG.cell_size)
+
+    rng = random.Random(seed)
+    grid = Grid(GAME_CONFIG)
+    snake = Snake(grid)
+    food = generate_food(grid, snake, rng)
+    score = 0
+    profiler.lap("setup")
+
+    # Used to track distance from current food and moves since last food
+    food_cur_dist = (abs(food.x -
+                         snake.coords[0][0]), abs(food.y -
+                                                  snake.coords[0][1]))
+    steps_since_food = 0
+    steps = 0
+    loops = LoopDetector(snake, GAME_CONFIG)
+
+    isRunning = True
+    while isRunning:
+        # Counting moves instead of time keeps the evaluation independent of
+        # machine speed, so there is no need to throttle the loop either.
+        if steps_since_food >= starve_limit(len(snake.coords), GAME_CONFIG):
+            fitness -= 500
+            cause = "starved"
+            isRunning = False
+            break
+
+        # Handle Quitting
+        if render:
+            handle_events()
+
+        # Make a decision based on the 8 adjacent squares and food's relative
+        # position and use it
+        inputs = observe(grid, snake, food)
+        profiler.lap("observe")
+        decision = network.activate(inputs)
+        profiler.lap("activate")
+
+        # Decision size is 3 and each index from 0 to 2 represents L,R and
+        # nothing, which are also the action codes. We simply choose the
+        # maximum of these three to make a decision.
+        action = decision.index(max(decision))
+        snake.move(grid, action)
+        if recorder is not None:
+            recorder.record(action)
+        steps_since_food += 1
+        steps += 1
+
+        # Update current distance to food
+        food_prev_dist = food_cur_dist
+        food_cur_dist = (
+            abs(food.x - snake.coords[0][0]), abs(food.y - snake.coords[0][1]))
+
+        # If it moved closer to the food give it points and if it moved away
+        # take away more points. On the whole self loops lose points
+        if food_cur_dist[0] < food_prev_dist[0] or food_cur_dist[1] < food_prev_dist[1]:
+            fitness += 1
+        else:
+            fitness -= 1.5
+        profiler.lap("move")
+
+        # Check collision
+        if snake.collide(food):
+            steps_since_food = 0  # Reset moves since last food
+            fitness += 4  # Lots of fitness
+            score += 1
+            snake.elongate(grid)
+
+            # RGB snakes are essential for training /s
+            if render:
+                renderer.snake_ate()
+
+            food = generate_food(grid, snake, rng)
+        profiler.lap("food")
+
+        # Check for failure and deduct points accordingly
+        failure = has_failed(snake, GAME_CONFIG)
+        profiler.lap("collision")
+        if failure is not None:
+            fitness -= FAIL_PENALTY[failure]
+            cause = failure
+            isRunning = False
+            break
+
+        if render:
+            renderer.draw(snake, food, score)
+            profiler.lap("render")
+
+        if score >= SOLVED_SCORE:
+            cause = "solved"
+            isRunning = False
+            break
+
+        # A snake in a loop would go on until it starves
+        if DETECT_LOOPS:
+            if steps_since_food == 0:
+                loops.reset(snake, fitness)
+            elif loops.update(snake, fitness):
+                limit = starve_limit(len(snake.coords), GAME_CONFIG)
+                fitness = loops.extrapolate(limit) - 500
+                cause = "loop"
+                isRunning = False
+                break
+        profiler.lap("loops")
 
-def draw(window, snake, food, score):
+    return fitness, score, steps, cause
+
+
+def eval_genome(genome, config, seed=None):
     """
-    This function draws and updates the pygame window with the given information.
+    This function evaluates a single genome without drawing anything. It only
+    depends on its arguments, so it can be run in a worker process.
 
     Arguments:
-        window {Surface} -- The active PyGame window
-        snake {Snake} -- The snake in the game
-        food {Food} -- The food in the game
-        score {int} -- The current score
-    """
-
-    global ANIMATION_TICK
-    ANIMATION_TICK -= 1  # Used to change food color
-
-    window.fill((0, 0, 51))
-
-    # Food color changing and drawing is handled here
-    if ANIMATION_TICK == 0:
-        global FOOD_RGB
-        FOOD_RGB = (
-            random.randrange(
-                50, 255), random.randrange(
-                50, 255), random.randrange(
-                50, 255))
-        FOOD_IMG.fill(FOOD_RGB)
-        ANIMATION_TICK = 25
-    else:
-        window.blit(FOOD_IMG, (food.x * 15, food.y * 15))
+        genome -- The genome to evaluate
+        config -- The NEAT config used to build the NN
+        seed {int} -- Seed for the food positions, random if not given
 
-    # Draw snake
-    for i, coord in enumerate(snake.coords):
-        x = coord[0] * 15
-        y = coord[1] * 15
+    Returns:
+        tuple -- The fitness earned, the final score, the number of moves and
+        how the game ended
+    """
+    return play_genome(genome, config, False, seed)
 
-        if i == 0:
-            head = pygame.Surface((15, 15))
-            head.fill((255, 255, 255))
-            WINDOW.blit(head, (x, y))
-        else:
-            WINDOW.blit(SNAKE_IMG, (x, y))
 
-    # Draw Score
-    score_txt = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
-    window.blit(
-        score_txt,
-        (WIN_WIDTH - 10 - score_txt.get_width(), 10))  # top right of screen
+def play_games(genomes, config, seeds, on_step=None):
+    """
+    This function plays one game per seed with the NN of every genome, all at
+    once with a BatchGame and a BatchNetwork. Every genome plays on the same
+    seeds, so they all get the same food positions. The rules and the fitness
+    are the same as in play_genome.
+
+    Arguments:
+        genomes {list} -- The genomes to evaluate
+        config -- The NEAT config used to build the NNs
+        seeds {list} -- The seeds of the games every genome plays
+        on_step -- Function called with the BatchGame after every move, e.g.
+        to draw it. Game g of genome p is game p * len(seeds) + g.
+
+    Returns:
+        tuple of ndarray -- The fitness, final score, number of moves and end
+        cause of every game, each shaped (genomes, seeds)
+    """
+    profiler = PROFILER
+    profiler.start()
+
+    P, K = len(genomes), len(seeds)
+    network = BatchNetwork.create(genomes, config)
+    game = BatchGame(P * K, np.tile(np.asarray(seeds, dtype=np.uint64), P),
+                     GAME_CONFIG)
+
+    fitness = np.zeros(P * K)
+    causes = np.full(P * K, None, dtype=object)
+    running = np.ones(P * K, dtype=bool)
+    steps_since_food = np.zeros(P * K, dtype=np.int64)
+    food_cur_dist = np.abs(game.food - game.head)
+    penalty = np.array([0.0, FAIL_PENALTY["wall"], FAIL_PENALTY["self"]])
+
+    loops = (BatchLoopDetector(game, most_moves=starve_limit(
+        game.capacity, GAME_CONFIG)) if DETECT_LOOPS else None)
+
+    # Networks with a game still running. Finished ones are dropped from the
+    # batch once there are few enough of them to be worth the copy.
+    active = np.arange(P)
+    actions = np.full((P, K), FORWARD, dtype=np.int64)
+    profiler.lap("setup")
+
+    while True:
+        limit = starve_limit(game.length, GAME_CONFIG)
+        starved = running & (steps_since_food >= limit)
+        fitness[starved] -= 500
+        causes[starved] = "starved"
+        running &= ~starved
+
+        # Games that were stopped here are frozen like games that failed
+        game.alive &= running
+        if not running.any():
+            break
+
+        still_active = running.reshape(P, K)[active].any(axis=1)
+        if still_active.sum() <= len(active) // 2:
+            network = network.select(np.flatnonzero(still_active))
+            active = active[still_active]
+
+        inputs = observe_batch(game).reshape(P, K, -1)[active]
+        profiler.lap("observe")
+        actions[active] = network.activate(inputs).argmax(axis=2)
+        profiler.lap("activate")
+
+        ate, died = game.step(actions.reshape(-1))
+        steps_since_food[running] += 1
+
+        # Distance to the food right after the move, before any food is
+        # eaten, which for a snake that ate is 0.
+        food_prev_dist = food_cur_dist
+        food_cur_dist = np.abs(game.food - game.head)
+        food_cur_dist[ate] = 0
+        closer = np.any(food_cur_dist < food_prev_dist, axis=1)
+        fitness[running] += np.where(closer, 1, -1.5)[running]
+        profiler.lap("move")
+
+        steps_since_food[ate] = 0
+        fitness[ate] += 4
+        profiler.lap("food")
+
+        fitness[died] -= penalty[game.death[died]]
+        causes[died] = [DEATH_CAUSES[d] for d in game.death[died]]
+        running &= ~died
+
+        solved = running & (game.score >= SOLVED_SCORE)
+        causes[solved] = "solved"
+        running &= ~solved
+        profiler.lap("collision")
+
+        if loops is not None:
+            looping = np.flatnonzero(loops.update(running, ate, fitness))
+            if len(looping) > 0:
+                limit = starve_limit(game.length[looping], GAME_CONFIG)
+                fitness[looping] = loops.extrapolate(looping, limit) - 500
+                causes[looping] = "loop"
+                running[looping] = False
+        profiler.lap("loops")
+
+        if on_step is not None:
+            on_step(game)
+            profiler.lap("render")
+
+    return (fitness.reshape(P, K), game.score.reshape(P, K),
+            game.steps.reshape(P, K), causes.reshape(P, K))
+
+
+def watch_genomes(genomes, config):
+    """
+    This function shows the given genomes playing side by side in one window,
+    all of them on the same food positions.
+
+    Arguments:
+        genomes {list} -- The genomes to watch
+        config -- The NEAT config used to build the NNs
+    """
+    # Only imported when drawing, so training never loads pygame
+    from resources.render import TiledViewer
+    viewer = TiledViewer(len(genomes), GAME_CONFIG.width, GAME_CONFIG.height)
 
-    pygame.display.update()
+    def show(game):
+        handle_events()
+        viewer.draw(game)
+        reference.game_clock.tick(WATCH_FPS)
+
+    # A separate generator picks the seed, so watching does not change how
+    # training goes.
+    seed = random.Random().getrandbits(32)
+    play_games(genomes, config, [seed], show)
+
+
+def aggregate_fitness(fitness, method):
+    """
+    This function combines the fitness a genome earned in several games.
+
+    Arguments:
+        fitness {ndarray} -- (genomes, games) fitness of every game
+        method {str} -- "mean", "min", "median" or "q" followed by a
+        percentile, e.g. "q25" for the lower quartile
+
+    Returns:
+        ndarray -- The fitness of every genome
+    """
+    if method == "mean":
+        return fitness.mean(axis=1)
+    if method == "min":
+        return fitness.min(axis=1)
+    if method == "median":
+        return np.median(fitness, axis=1)
+    if method.startswith("q"):
+        return np.percentile(fitness, float(method[1:]), axis=1)
+    raise ValueError("Unknown aggregation {0!r}".format(method))
+
+
+# Config shared by every genome a worker process evaluates. It is sent once
+# when the worker starts instead of with every genome.
+_WORKER_CONFIG = None
+
+
+def _init_worker(config, game_config):
+    global _WORKER_CONFIG, GAME_CONFIG
+    _WORKER_CONFIG = config
+    GAME_CONFIG = game_config
+
+
+def _eval_in_worker(job):
+    genome, seed = job
+    return eval_genome(genome, _WORKER_CONFIG, seed)
+
+
+def _play_games_in_worker(job):
+    genomes, seeds = job
+    return play_games(genomes, _WORKER_CONFIG, seeds)
+
+
+class PoolEvaluator:
+    """
+    This class evaluates the genomes of a generation in a pool of worker
+    processes.
+    """
+
+    def __init__(self, num_workers, config):
+        """
+        This function starts the worker processes.
+
+        Arguments:
+            num_workers {int} -- The number of worker processes to use
+            config -- The NEAT config used to build the NNs
+        """
+        self.num_workers = num_workers
+        self.pool = multiprocessing.Pool(
+            num_workers, _init_worker, (config, GAME_CONFIG))
+
+    def evaluate(self, genomes, seeds):
+        """
+        This function evaluates the given genomes in the worker processes.
+
+        Arguments:
+            genomes {list} -- The genomes to evaluate
+            seeds {list} -- The seed of the game played by each genome
+
+        Returns:
+            list -- The (fitness, score, moves, cause) result of each genome,
+            in order
+        """
+        # A few chunks per worker keeps the workers busy until the end without
+        # paying to send every genome separately.
+        chunksize = max(1, len(genomes) // (4 * self.num_workers))
+        return self.pool.map(_eval_in_worker, zip(genomes, seeds), chunksize)
+
+    def play_games(self, genomes, seeds):
+        """
+        This function plays the games of play_games in the worker processes,
+        each worker taking a share of the genomes.
+
+        Arguments:
+            genomes {list} -- The genomes to evaluate
+            seeds {list} -- The seeds of the games every genome plays
+
+        Returns:
+            tuple of ndarray -- The same results as play_games
+        """
+        size = -(-len(genomes) // self.num_workers)
+        jobs = [(genomes[i:i + size], seeds)
+                for i in range(0, len(genomes), size)]
+        parts = self.pool.map(_play_games_in_worker, jobs)
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def close(self):
+        """
+        This function shuts the worker processes down.
+        """
+        self.pool.close()
+        self.pool.join()
+
+
+# Preview settings. These are set from the command line in main().
+PREVIEW_EVERY = 0 if HEADLESS else 1  # Draw every Nth genome, 0 to never draw
+PREVIEW_BEST = False  # Replay the best genome of each generation on screen
+WATCH_TOP = 0  # Show the N fittest genomes of each generation playing at once
+WATCH_FPS = 30  # Moves per second when watching several genomes
+
+# Evaluates genomes in parallel when set, otherwise they are played one by one
+EVALUATOR = None
+
+# Games played by every genome in a generation. With more than one, all
+# genomes play the same games together and their fitness is combined with
+# aggregate_fitness using AGGREGATE.
+GAMES_PER_GENOME = 1
+AGGREGATE = "mean"
+
+# Saves the NN of the best genome seen so far, set up in run()
+REGISTRY = None
+
+# Folder the game of the best genome of each generation is recorded in, if any
+RECORD_DIR = None
+
+# Seeds of the games played in every generation, or None to play new games in
+# each generation. Set from the command line in main().
+FIXED_SEEDS = None
+
+# Results of genomes that already played the fixed games, set up in run()
+FITNESS_CACHE = None
 
 
 def eval(genomes, config):
     """
     This function runs the game and evalutes the NNs formed from the given config.
+
+    Returns:
+        list -- The (fitness, score, moves, cause) result of each genome, in
+        order. When every genome plays several games, the score is its best
+        one, the moves are those of all its games and the cause is how most
+        of its games ended.
+    """
+
+    # The food of every game is seeded from the random module, so a run can be
+    # repeated with random.seed no matter how the genomes are evaluated. With
+    # several games per genome, all genomes play the same games.
+    if GAMES_PER_GENOME > 1:
+        seeds = FIXED_SEEDS or [random.getrandbits(32)
+                                for _ in range(GAMES_PER_GENOME)]
+        games = [tuple(seeds)] * len(genomes)
+    else:
+        if FIXED_SEEDS:
+            seeds = FIXED_SEEDS * len(genomes)
+        else:
+            seeds = [random.getrandbits(32) for _ in genomes]
+        games = seeds
+
+    # Genomes that already played the same games get their old results
+    results = [None] * len(genomes)
+    if FITNESS_CACHE is not None:
+        keys = [FITNESS_CACHE.key(genome, games[i])
+                for i, (_, genome) in enumerate(genomes)]
+        results = [FITNESS_CACHE.get(key) for key in keys]
+    todo = [i for i, result in enumerate(results) if result is None]
+
+    if GAMES_PER_GENOME > 1:
+        new_results, played = eval_games([genomes[i] for i in todo], config,
+                                         seeds)
+    else:
+        if EVALUATOR is not None:
+            new_results = EVALUATOR.evaluate([genomes[i][1] for i in todo],
+                                             [seeds[i] for i in todo])
+        else:
+            new_results = []
+            for i in todo:
+                render = PREVIEW_EVERY > 0 and i % PREVIEW_EVERY == 0
+                new_results.append(
+                    play_genome(genomes[i][1], config, render, seeds[i]))
+        played = [(steps, cause) for _, _, steps, cause in new_results]
+
+    for i, result in zip(todo, new_results):
+        results[i] = result
+        if FITNESS_CACHE is not None:
+            FITNESS_CACHE.put(keys[i], result)
+
+    for (_, genome), (fitness, score, steps, cause) in zip(genomes, results):
+        genome.fitness = fitness
+
+    for steps, cause in played:
+        PROFILER.count("games")
+        PROFILER.count("steps", steps)
+        PROFILER.count("death: " + cause)
+
+    # Only the fittest genome of the generation can beat the best one so far
+    if REGISTRY is not None and genomes:
+        best = max(range(len(genomes)), key=lambda i: results[i][0])
+        REGISTRY.offer(genomes[best][1], config, results[best][1], GAME_CONFIG,
+                       evaluation_settings())
+
+    if RECORD_DIR is not None and genomes:
+        best = max(range(len(genomes)), key=lambda i: results[i][0])
+        # A single game per genome is replayed with its own seed, so the
+        # recording is the game that earned the fitness. Batched games spawn
+        # food differently, so the genome plays a new game instead.
+        if GAMES_PER_GENOME == 1:
+            seed = seeds[best]
+        else:
+            seed = random.Random().getrandbits(32)
+        unprofiled(record_genome, genomes[best][1], config, seed)
+
+    if PREVIEW_BEST:
+        # The replay is only for watching, so the fitness the genome earned
+        # during evaluation is kept.
+        best = max((genome for _, genome in genomes), key=lambda g: g.fitness)
+        unprofiled(play_genome, best, config, True)
+
+    if WATCH_TOP > 0:
+        top = sorted((genome for _, genome in genomes),
+                     key=lambda g: g.fitness, reverse=True)[:WATCH_TOP]
+        unprofiled(watch_genomes, top, config)
+
+    return results
+
+
+def unprofiled(play, *args):
     """
+    This function replays games that are not part of the evaluation, like
+    previews and recordings, without profiling them, so they do not show up
+    in the profile of the generation.
 
-    global FOOD_RGB
+    Arguments:
+        play -- The function that plays the games
+        args -- The arguments to call it with
 
-    for _, genome in genomes:
+    Returns:
+        Whatever play returns
+    """
+    global PROFILER
+    profiler, PROFILER = PROFILER, NullProfiler()
+    try:
+        with profiler.paused():
+            return play(*args)
+    finally:
+        PROFILER = profiler
 
-        network = neat.nn.FeedForwardNetwork.create(genome, config)
-        genome.fitness = 0
 
-        grid = Grid()
-        snake = Snake()
-        food = generate_food(grid, snake)
-        score = 0
+def evaluation_settings():
+    """
+    This function describes the settings that decide how fitness is worked
+    out, so the model registry only compares fitness earned the same way.
 
-        # Used to track time since distance from current food and time since
-        # last food
-        food_cur_dist = (abs(food.x -
-                             snake.coords[0][0]), abs(food.y -
-                                                      snake.coords[0][1]))
-        last_food = pygame.time.get_ticks()
+    Returns:
+        str -- The settings, e.g. "games=1 aggregate=mean"
+    """
+    return "games={0} aggregate={1}".format(GAMES_PER_GENOME, AGGREGATE)
 
-        isRunning = True
-        while isRunning:
-            game_clock.tick(1000)  # I am speed
 
-            # Time since last food in seconds
-            time_since_food = (pygame.time.get_ticks() - last_food) / 1000
+def record_genome(genome, config, seed):
+    """
+    This function plays a game with a genome and saves the recording of it
+    in RECORD_DIR, named after the generation.
 
-            # At 1000fps if it hasn't found food in 4 seconds it is definitely
-            # self looping so we stop it.
-            if time_since_food >= 4:
-                genome.fitness -= 500
-                isRunning = False
-                break
+    Arguments:
+        genome -- The genome to play with
+        config -- The NEAT config used to build the NN
+        seed {int} -- Seed for the food positions
+    """
+    recorder = GameRecorder(seed, GAME_CONFIG)
+    _, score, _, cause = play_genome(genome, config, False, seed, recorder)
 
-            # Handle Quitting
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    isRunning = False
-                    pygame.quit()
-                    quit()
-
-            # Make a decision and use it
-            decision = make_decision(network, grid, snake, food)
-            max_val = max(decision)
-
-            # Decision size is 3 and each index from 0 to 2 represents L,R and
-            # nothing. We simply choose the maximum of these three to make a
-            # decision.
-            if max_val == decision[0]:
-                snake.move(grid, "L")
-            elif max_val == decision[1]:
-                snake.move(grid, "R")
-            else:
-                snake.tick(grid)
-
-            # Update current distance to food
-            food_prev_dist = food_cur_dist
-            food_cur_dist = (
-                abs(food.x - snake.coords[0][0]), abs(food.y - snake.coords[0][1]))
-
-            # If it moved closer to the food give it points and if it moved away
-            # take away more points. On the whole self loops lose points
-            if food_cur_dist[0] < food_prev_dist[0] or food_cur_dist[1] < food_prev_dist[1]:
-                genome.fitness += 1
-            else:
-                genome.fitness -= 1.5
-
-            # Check collision
-            if snake.collide(food):
-                last_food = pygame.time.get_ticks()  # Reset last food timer
-                genome.fitness += 4  # Lots of fitness
-                score += 1
-                snake.elongate(grid)
-
-                # RGB snakes are essential for training /s
-                SNAKE_IMG.fill(FOOD_RGB)
-
-                food = generate_food(grid, snake)
-
-            # Check for failure and deduct points accordingly
-            if has_failed(snake, genome):
-                isRunning = False
-                break
+    generation = 0 if REGISTRY is None else REGISTRY.generation
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    recorder.save(os.path.join(RECORD_DIR, "generation-{0}.npz".format(
+        generation)), score, cause)
 
-            draw(WINDOW, snake, food, score)
 
-            # A score of 45 generally means it has gotten as good as it could
-            # have, so we store the model
-            if score >= 45:
-                best_model = network
-                nn_file = open("best_model.pickle", "wb")
-                pickle.dump(best_model, nn_file)
-                nn_file.close()
+def eval_games(genomes, config, seeds):
+    """
+    This function lets every genome play the same games, one per seed, so luck
+    with the food positions affects them all alike.
 
-                isRunning = False
-                break
+    Arguments:
+        genomes {list} -- (genome id, genome) pairs to evaluate
+        config -- The NEAT config used to build the NNs
+        seeds {list} -- The seeds of the games
+
+    Returns:
+        tuple -- The (fitness, score, moves, cause) result of each genome and
+        the (moves, cause) of every game played
+    """
+    if not genomes:
+        return [], []
+    genomes = [genome for _, genome in genomes]
+
+    if EVALUATOR is not None:
+        fitness, score, steps, causes = EVALUATOR.play_games(genomes, seeds)
+    else:
+        fitness, score, steps, causes = play_games(genomes, config, seeds)
 
+    results = []
+    combined = aggregate_fitness(fitness, AGGREGATE)
+    for p in range(len(genomes)):
+        cause = Counter(causes[p]).most_common(1)[0][0]
+        results.append((float(combined[p]), int(score[p].max()),
+                        int(steps[p].sum()), cause))
 
-def run(config_path):
+    played = list(zip(steps.ravel().tolist(), causes.ravel().tolist()))
+    return results, played
+
+
+def run(config_path, workers=1, profile=False, profile_log=None,
+        checkpoint_dir="checkpoints", checkpoint_every=5, resume=None,
+        models_dir="models", cache_size=0):
     """
     This function runs each generation of NNs using the configuration file
     passed to it.
 
     Arguments:
         config_path  -- Path to the NNs config file
+        workers {int} -- The number of processes evaluating genomes
+        profile {bool} -- Whether to print where the time of each generation went
+        profile_log {str} -- File to also write the profile of each generation to
+        checkpoint_dir {str} -- Folder to save checkpoints in
+        checkpoint_every {int} -- Generations between checkpoints, 0 for none
+        resume {str} -- Checkpoint to continue training from. The config
+        saved in it is used instead of the one at config_path.
+        models_dir {str} -- Folder of the registry the best NNs are saved in
+        cache_size {int} -- The number of results the fitness cache keeps, 0
+        for no cache. It only helps when FIXED_SEEDS is set.
     """
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
-                                config_path)
+    global EVALUATOR, PROFILER, REGISTRY, FITNESS_CACHE
+
+    if resume is not None:
+        print("Resuming from {0}".format(resume))
+        population, stats = restore_checkpoint(resume)
+        config = population.config
+    else:
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_path)
+        population = neat.Population(config)
+        stats = None
 
-    population = neat.Population(config)
     population.add_reporter(neat.StdOutReporter(True))
 
-    stats = neat.StatisticsReporter()
+    if stats is None:
+        stats = neat.StatisticsReporter()
     population.add_reporter(stats)
 
-    winner = population.run(eval, 50)
+    checkpointer = None
+    if checkpoint_every > 0:
+        checkpointer = AsyncCheckpointer(checkpoint_dir, checkpoint_every, stats)
+        checkpointer.watch(population)
+        population.add_reporter(checkpointer)
+
+    REGISTRY = ModelRegistry(models_dir)
+    population.add_reporter(REGISTRY)
+
+    if cache_size > 0:
+        FITNESS_CACHE = FitnessCache(cache_size)
+        population.add_reporter(FITNESS_CACHE)
+
+    if profile or profile_log is not None:
+        PROFILER = Profiler()
+        population.add_reporter(ProfileReporter(PROFILER, profile_log))
+
+    if workers > 1:
+        EVALUATOR = PoolEvaluator(workers, config)
+
+    try:
+        population.run(eval, max(GENERATIONS - population.generation, 0))
+    finally:
+        if checkpointer is not None:
+            checkpointer.wait()
+        if EVALUATOR is not None:
+            EVALUATOR.close()
+            EVALUATOR = None
+        REGISTRY = None
+        FITNESS_CACHE = None
+
+
+def parse_args(argv):
+    """
+    This function reads the training options from the command line.
+
+    Arguments:
+        argv {list} -- The command line arguments, without the program name
+
+    Returns:
+        Namespace -- The parsed options
+    """
+    parser = argparse.ArgumentParser(description="Train the snake AI with NEAT.")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="train without opening a window (same as SNAKE_HEADLESS=1)")
+    parser.add_argument(
+        "--preview-every", type=int, metavar="N", default=None,
+        help="draw every Nth genome of a generation, 0 to draw none")
+    parser.add_argument(
+        "--preview-best", action="store_true",
+        help="replay the best genome of each generation on screen")
+    parser.add_argument(
+        "--watch-top", type=int, metavar="N", default=0,
+        help="show the N fittest genomes of each generation playing side by "
+        "side in one window")
+    parser.add_argument(
+        "--workers", type=int, metavar="N", default=1,
+        help="evaluate genomes in N processes, 0 for one per CPU core")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="print a breakdown of each generation's evaluation time; phase "
+        "times are only measured when there are no worker processes")
+    parser.add_argument(
+        "--profile-log", metavar="PATH",
+        help="also append each generation's profile to PATH as JSON lines")
+    parser.add_argument(
+        "--checkpoint-dir", metavar="PATH", default="checkpoints",
+        help="folder to save checkpoints in (default: checkpoints)")
+    parser.add_argument(
+        "--checkpoint-every", type=int, metavar="N", default=5,
+        help="save a checkpoint every N generations, 0 to never save one")
+    parser.add_argument(
+        "--resume", nargs="?", const="latest", metavar="CHECKPOINT",
+        help="continue training from a checkpoint, by default the latest one "
+        "in the checkpoint folder")
+    parser.add_argument(
+        "--models-dir", metavar="PATH", default="models",
+        help="folder the best NNs are saved in (default: models)")
+    parser.add_argument(
+        "--record-dir", metavar="PATH",
+        help="record the game of the best genome of each generation in PATH, "
+        "to watch with testAI.py --replay")
+    parser.add_argument(
+        "--board", type=GameConfig.parse, metavar="WxH", default=DEFAULT_GAME,
+        help="size of the board in blocks, e.g. 64x64 (default: 30x30)")
+    parser.add_argument(
+        "--games", type=int, metavar="K", default=1,
+        help="games every genome plays per generation, all genomes playing "
+        "the same K games (default: 1)")
+    parser.add_argument(
+        "--aggregate", metavar="HOW", default="mean",
+        help="how the fitness of the K games is combined: mean, min, median "
+        "or qP for the P-th percentile, e.g. q25 (default: mean)")
+    parser.add_argument(
+        "--fixed-games", type=int, metavar="SEED",
+        help="play the same games, picked with SEED, in every generation "
+        "instead of new ones. Genomes that already played them reuse their "
+        "results.")
+    parser.add_argument(
+        "--cache-size", type=int, metavar="N", default=10000,
+        help="results kept for --fixed-games, 0 to always play the games "
+        "again (default: 10000)")
+    args = parser.parse_args(argv)
+
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    try:
+        aggregate_fitness(np.zeros((1, 1)), args.aggregate)
+    except ValueError:
+        parser.error("invalid --aggregate " + repr(args.aggregate))
+    if args.games > 1 and args.preview_every:
+        parser.error("--preview-every cannot be used with --games")
+
+    if args.resume == "latest":
+        args.resume = latest_checkpoint(args.checkpoint_dir)
+        if args.resume is None:
+            parser.error("no checkpoint found in " + args.checkpoint_dir)
+
+    if args.workers == 0:
+        args.workers = multiprocessing.cpu_count()
+    if args.workers > 1:
+        # Worker processes never draw, and they must not inherit a window.
+        if not HEADLESS:
+            parser.error("--workers needs --headless")
+        if args.preview_every:
+            parser.error("--preview-every cannot be used with --workers")
+    return args
 
 
 def main():
+    global PREVIEW_EVERY, PREVIEW_BEST, WATCH_TOP, GAMES_PER_GENOME, AGGREGATE
+    global GAME_CONFIG, RECORD_DIR, FIXED_SEEDS
+
+    args = parse_args(sys.argv[1:])
+    if args.preview_every is not None:
+        PREVIEW_EVERY = args.preview_every
+    PREVIEW_BEST = args.preview_best
+    WATCH_TOP = args.watch_top
+    GAMES_PER_GENOME = args.games
+    AGGREGATE = args.aggregate
+    GAME_CONFIG = args.board
+    RECORD_DIR = args.record_dir
+    if args.fixed_games is not None:
+        rng = random.Random(args.fixed_games)
+        FIXED_SEEDS = [rng.getrandbits(32) for _ in range(GAMES_PER_GENOME)]
+
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, "resources/config-feedforward.txt")
-    run(config_path)
+    run(config_path, args.workers, args.profile, args.profile_log,
+        args.checkpoint_dir, args.checkpoint_every, args.resume,
+        args.models_dir,
+        args.cache_size if FIXED_SEEDS is not None else 0)
 
 
 if __name__ == "__main__":